@@ -0,0 +1,67 @@
+#----------------------------------------------------------------------------#
+# JSON API.
+#
+# The API serves the same data builders as the HTML pages. Every response
+# carries a strong ETag computed from a narrow version lookup -- updated_at
+# of the rows the response is built from, plus how many of its shows are
+# still upcoming, since that changes with time alone -- so a request with a
+# matching If-None-Match is answered 304 before any data is built.
+#----------------------------------------------------------------------------#
+
+import hashlib
+from flask import request, jsonify, Response
+from sqlalchemy import func, tuple_
+from models import db, Venue, Artist, Show
+from listings import MAX_PER_PAGE
+
+
+def _detail_version(model, owner_key, other, other_key, entity_id, now):
+  return db.session.query(
+      model.updated_at,
+      func.count(Show.id),
+      func.count(Show.id).filter(Show.start_date > now),
+      func.max(Show.updated_at),
+      func.max(other.updated_at)
+    ).select_from(model
+    ).outerjoin(Show, owner_key == model.id
+    ).outerjoin(other, other_key == other.id
+    ).filter(model.id == entity_id
+    ).group_by(model.id
+    ).first()
+
+
+def venue_version(venue_id, now):
+  return _detail_version(Venue, Show.venue_id, Artist, Show.artist_id, venue_id, now)
+
+
+def artist_version(artist_id, now):
+  return _detail_version(Artist, Show.artist_id, Venue, Show.venue_id, artist_id, now)
+
+
+def shows_version(after, limit):
+  # the rows of the page (and one past it, for the next cursor) and when they last changed
+  limit = max(1, min(limit, MAX_PER_PAGE))
+  query = db.session.query(Show.id, Show.updated_at, Venue.updated_at, Artist.updated_at
+    ).join(Venue, Show.venue_id == Venue.id
+    ).join(Artist, Show.artist_id == Artist.id
+    ).order_by(Show.start_date, Show.id)
+  if after is not None:
+    query = query.filter(tuple_(Show.start_date, Show.id) > tuple_(*after))
+  return query.limit(limit + 1).all()
+
+
+def conditional_json(version, build):
+  # 304 if the client holds the current version, otherwise build() as JSON
+  if version is None:
+    return None
+  etag = hashlib.sha1(repr(version).encode()).hexdigest()
+  if etag in request.if_none_match:
+    response = Response(status=304)
+  else:
+    response = jsonify(build())
+  response.set_etag(etag)
+  return response
+
+
+def serialize_shows(shows):
+  return [dict(show, start_time=show["start_time"].isoformat()) for show in shows]
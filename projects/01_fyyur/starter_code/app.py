@@ -2,473 +2,488 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from sqlalchemy import distinct
-import logging
-from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-import sys
-
-#----------------------------------------------------------------------------#
-# App Config.
-#----------------------------------------------------------------------------#
-
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-
+from datetime import datetime
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, stream_with_context, jsonify
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
 from models import *
-
+from listings import venue_areas, venue_detail, artist_detail
+from listings import shows_page, artists_page, parse_show_cursor, SHOWS_PER_PAGE, ARTISTS_PER_PAGE
+from counters import release_venue, reconcile_show_counts_command
+from directory import read_directory, refresh_areas, check_venue_directory_command
+from editing import save_edits, form_data, EditConflict, OutdatedForm
+from search import find_venues, find_artists
+from booking import book_show, forget_shows, BookingConflict
+from facets import parse_selection, genre_facets, count_genres
+from cache import page_cache, cached_page
+from typeahead import typeahead
+from pooling import pool_stats, engine_options
+from metrics import request_metrics, configure_metrics
+from logs import configure_logging
+from api import venue_version, artist_version, shows_version, conditional_json, serialize_shows
+from importer import import_data_command
+from seed import seed_data_command
+from filters import format_datetime
 
 #----------------------------------------------------------------------------#
-# Filters.
-#----------------------------------------------------------------------------#
-
-def format_datetime(value, format='medium'):
-  # date = dateutil.parser.parse(value)
-  if isinstance(value, str):
-    date = dateutil.parser.parse(value)
-  else:
-    date = value
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
-
-app.jinja_env.filters['datetime'] = format_datetime
-
-#----------------------------------------------------------------------------#
-# Controllers.
+# App Config.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
-def index():
-  return render_template('pages/home.html')
-
-
-#  Venues
-#  ----------------------------------------------------------------
-
-@app.route('/venues')
-def venues():
-  data = []
-  for location in db.session.query(distinct(Venue.city), Venue.state).all():
-    city = location[0]
-    state = location[1]
-    location_info = {"city" : city , "state" : state , "venues" : []}
-    venues = Venue.query.filter_by(city=city,state=state).all()
-    for venue in venues :
-      num_of_shows = len(Show.query.filter_by(venue_id=venue.id).filter(Show.start_date >= datetime.now()).all())
-      location_info["venues"].append( {
-        "id" : venue.id,
-        "name" : venue.name,
-        "num_upcoming_shows" : num_of_shows
-      })
-    data.append(location_info)
-  return render_template("pages/venues.html", areas=data)
-
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-  # seach for Hop should return "The Musical Hop".
-  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  response = dict()
-  tag = request.form.get('search_term', '')
-  searched_venue = "%{}%".format(tag)
-  venues = Venue.query.filter(Venue.name.ilike(searched_venue)).all()
-  data = list()
-  for venue in venues:
-    data.append({
-      "id": venue.id,
-      "name": venue.name,
-      "num_upcoming_shows": len(Show.query.filter_by(venue_id = venue.id).filter(Show.start_date > datetime.now()).all())
-    })
-  response={
-    "count": len(data),
-    "data": data
-  }
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
-
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-  # shows the venue page with the given venue_id
-  data = dict()
-  time_now = datetime.now()
-  venue = Venue.query.get(venue_id)
-  shows = Show.query.filter_by(venue_id = venue_id).join(Artist)
-  upcoming_shows = list()
-  past_shows = list()
-  for show in shows.filter(Show.start_date > time_now).all():
-    upcoming_shows.append({
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_date
-    })
-  for show in shows.filter(Show.start_date <= time_now).all():
-    past_shows.append({
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_date
-    })
-  data = { 
-    "id": venue.id,
-    "name": venue.name,
-    "genres": venue.genres,
-    "address": venue.address,
-    "city": venue.city,
-    "state": venue.state,
-    "phone": venue.phone,
-    "website": venue.website_link,
-    "facebook_link": venue.facebook_link,
-    "seeking_talent": venue.seeking_talent,
-    "seeking_description": venue.talent_description,
-    "image_link": venue.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows)
-  }
-  return render_template('pages/show_venue.html', venue=data)
-
-#  Create Venue
-#  ----------------------------------------------------------------
-
-@app.route('/venues/create', methods=['GET'])
-def create_venue_form():
-  form = VenueForm()
-  return render_template('forms/new_venue.html', form=form)
-
-@app.route('/venues/create', methods=['POST'])
-def create_venue_submission():
-  try:
-    venue = Venue()
-    venue.name = request.form['name']
-    venue.city = request.form['city']
-    venue.state = request.form['state']
-    venue.address = request.form['address']
-    venue.phone = request.form['phone']
-    venue.genres = request.form.getlist('genres')
-    venue.image_link = request.form['image_link']
-    venue.facebook_link = request.form['facebook_link']
-    venue.website_link = request.form['website_link']
-    venue.seeking_talent = True if 'seeking_talent' in request.form else False 
-    venue.talent_description = request.form['seeking_description']
-    db.session.add(venue)
-    db.session.commit()
-  # on successful db insert, flash success
-    flash('Venue ' + request.form['name'] + ' was successfully listed!')
-  except:
-    db.session.rollback()
-    print(sys.exc_info())
-    flash('An error occurred. Venue ' + venue.name + ' could not be listed.')
-  finally:
-    db.session.close()
-  return render_template('pages/home.html')
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-  try:
-      venue = Venue.query.get(venue_id)
-      db.session.delete(venue)
+def create_app(config='config.Config'):
+  # forms and dateutil are imported where they are first needed,
+  # so a worker starts without them
+  app = Flask(__name__)
+  app.config.from_object(config)
+  # from the final settings, so a subclass overriding the URI or a DB_POOL_* gets its own pool
+  app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(
+    app.config['SQLALCHEMY_DATABASE_URI'], app.config['DB_POOL_SIZE'],
+    app.config['DB_POOL_MAX_OVERFLOW'], app.config['DB_POOL_TIMEOUT'],
+    app.config['DB_POOL_RECYCLE'], app.config['DB_POOL_PRE_PING']))
+  db.init_app(app)
+  page_cache.init_app(app)
+  typeahead.init_app(app)
+  configure_metrics(app)
+  for command in (reconcile_show_counts_command, check_venue_directory_command,
+                  import_data_command, seed_data_command):
+    app.cli.add_command(command)
+  # every app gets the migrate extension, however it was started
+  from flask_migrate import Migrate
+  Migrate(app, db)
+
+  #--------------------------------------------------------------------------#
+  # Filters.
+  #--------------------------------------------------------------------------#
+
+  app.jinja_env.filters['datetime'] = format_datetime
+
+  def stream_template(template_name, **context):
+    # renders the template chunk by chunk so large pages start going out at once
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    stream = template.stream(context)
+    stream.enable_buffering(5)
+    return Response(stream_with_context(stream))
+
+  #--------------------------------------------------------------------------#
+  # Session lifecycle.
+  #--------------------------------------------------------------------------#
+
+  @app.teardown_request
+  def end_session(exc):
+    # one place that ends every request's session and returns its connection
+    if exc is not None:
+      db.session.rollback()
+    db.session.remove()
+
+  #--------------------------------------------------------------------------#
+  # Controllers.
+  #--------------------------------------------------------------------------#
+
+  @app.route('/')
+  def index():
+    return render_template('pages/home.html')
+
+
+  #  Venues
+  #  ----------------------------------------------------------------
+
+  @app.route('/venues')
+  @cached_page('venue', 'show')
+  def venues():
+    genres, match = parse_selection(request.args)
+    areas = venue_areas(genres, match) if genres else read_directory()
+    return render_template("pages/venues.html", areas=areas,
+                           facets=genre_facets(Venue, genres, match), genres=genres, match=match)
+
+
+  @app.route('/venues/search', methods=['POST'])
+  def search_venues():
+    # seach for Hop should return "The Musical Hop".
+    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+    tag = request.form.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    response = find_venues(tag, page)
+    return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+  @app.route('/venues/<int:venue_id>')
+  @cached_page('venue', 'show', 'artist')
+  def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    data = venue_detail(venue_id)
+    if data is None:
+      abort(404)
+    return render_template('pages/show_venue.html', venue=data)
+
+  #  Create Venue
+  #  ----------------------------------------------------------------
+
+  @app.route('/venues/create', methods=['GET'])
+  def create_venue_form():
+    from forms import VenueForm
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+  @app.route('/venues/create', methods=['POST'])
+  def create_venue_submission():
+    try:
+      venue = Venue()
+      venue.name = request.form['name']
+      venue.city = request.form['city']
+      venue.state = request.form['state']
+      venue.address = request.form['address']
+      venue.phone = request.form['phone']
+      venue.genres = request.form.getlist('genres')
+      venue.image_link = request.form['image_link']
+      venue.facebook_link = request.form['facebook_link']
+      venue.website_link = request.form['website_link']
+      venue.seeking_talent = True if 'seeking_talent' in request.form else False 
+      venue.talent_description = request.form['seeking_description']
+      db.session.add(venue)
+      refresh_areas([(venue.city, venue.state)])
+      count_genres(Venue, added=venue.genres)
       db.session.commit()
-      flash("Venue: " + venue.name + " was successfully deleted.")
-  except:
+      page_cache.bump('venue')
+      typeahead.put('venues', venue.id, venue.name)
+    # on successful db insert, flash success
+      flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    except:
+      db.session.rollback()
+      app.logger.exception('could not list venue')
+      flash('An error occurred. Venue ' + venue.name + ' could not be listed.')
+    return render_template('pages/home.html')
+
+  @app.route('/venues/<venue_id>', methods=['DELETE'])
+  def delete_venue(venue_id):
+    venue = Venue.query.get_or_404(venue_id)
+    name = venue.name
+    try:
+        db.session.delete(venue)
+        forget_shows(venue.shows)
+        release_venue(venue)
+        refresh_areas([(venue.city, venue.state)])
+        count_genres(Venue, removed=venue.genres)
+        db.session.commit()
+        page_cache.bump('venue', 'show')
+        typeahead.discard('venues', venue.id)
+        flash("Venue: " + name + " was successfully deleted.")
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('could not delete venue %s', venue_id)
+        flash("Venue: " + name + " could not be deleted")
+        return ('', 500)
+    return ('', 204)
+    # couldn't redirect to home, instead I wrote the redirect in frontend
+
+
+  #  Artists
+  #  ----------------------------------------------------------------
+  @app.route('/artists')
+  @cached_page('artist')
+  def artists():
+    after = request.args.get('after', None, type=int)
+    limit = request.args.get('limit', ARTISTS_PER_PAGE, type=int)
+    genres, match = parse_selection(request.args)
+    return stream_template('pages/artists.html', artists=artists_page(after, limit, genres, match),
+                           facets=genre_facets(Artist, genres, match), genres=genres, match=match)
+
+  @app.route('/artists/search', methods=['POST'])
+  def search_artists():
+    # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+    # search for "band" should return "The Wild Sax Band".
+    tag = request.form.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    response = find_artists(tag, page)
+    return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+  @app.route('/artists/<int:artist_id>')
+  @cached_page('artist', 'show', 'venue')
+  def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    data = artist_detail(artist_id)
+    if data is None:
+      abort(404)
+    return render_template('pages/show_artist.html', artist=data)
+
+  #  Update
+  #  ----------------------------------------------------------------
+  @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+  def edit_artist(artist_id):
+    from forms import ArtistForm
+    requested_artist = Artist.query.get_or_404(artist_id)
+    form = ArtistForm(data=form_data(Artist, requested_artist))
+    artist={
+      "id": requested_artist.id,
+      "name": requested_artist.name,
+      "genres": requested_artist.genres,
+      "city": requested_artist.city ,
+      "state": requested_artist.state,
+      "phone": requested_artist.phone,
+      "website": requested_artist.website_link,
+      "facebook_link": requested_artist.facebook_link,
+      "seeking_venue": requested_artist.seeking_venues,
+      "seeking_description": requested_artist.venue_description,
+      "image_link": requested_artist.image_link
+    }
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+  @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+  def edit_artist_submission(artist_id):
+    # artist record with ID <artist_id> using the new attributes
+    try:
+      artist, changed = save_edits(Artist, artist_id, request.form)
+      if changed:
+        if 'genres' in changed:
+          count_genres(Artist, added=changed['genres'], removed=artist['genres'])
+        db.session.commit()
+        page_cache.bump('artist')
+        if 'name' in changed:
+          typeahead.put('artists', artist_id, changed['name'])
+    except OutdatedForm:
+      db.session.rollback()
+      flash('The form was out of date. Review the details of artist ' + request.form.get('name', '') +
+            ' and save again.')
+      return redirect(url_for('edit_artist', artist_id=artist_id))
+    except EditConflict:
       db.session.rollback()
-      print(sys.exc_info())
-      flash("Venue: " + venue.name +  "could not be deleted")
-  finally:
-      db.session.close()
-  return 
-  # couldn't redirect to home, instead I wrote the redirect in frontend
-
-
-#  Artists
-#  ----------------------------------------------------------------
-@app.route('/artists')
-def artists():
-  data = list()
-  artists = Artist.query.all()
-  for artist in artists:
-    data.append({
-      "id": artist.id,
-      "name": artist.name
-    })
-  return render_template('pages/artists.html', artists=data)
-
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-  # search for "band" should return "The Wild Sax Band".
-  response = dict()
-  tag = request.form.get('search_term', '')
-  searched_artist = "%{}%".format(tag)
-  artists = Artist.query.filter(Artist.name.ilike(searched_artist)).all()
-  data = list()
-  for artist in artists:
-    data.append({
-      "id": artist.id,
-      "name": artist.name,
-      "num_upcoming_shows": len(Show.query.filter_by(artist_id = artist.id).filter(Show.start_date > datetime.now()).all())
-    })
-  response={
-    "count": len(data),
-    "data": data
-  }
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-  # shows the artist page with the given artist_id
-  data = dict()
-  past_shows = list()
-  upcoming_shows = list()
-  time_now = datetime.now()
-  artist = Artist.query.get(artist_id)
-  shows = Show.query.filter_by(artist_id = artist_id).join(Venue)
-  for show in shows.filter(time_now >= Show.start_date).all():
-    past_shows.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
-      "start_time": show.start_date
-    })
-  for show in shows.filter(time_now < Show.start_date).all():
-    upcoming_shows.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
-      "start_time": show.start_date
-    })
-  data={
-    "id": artist.id,
-    "name": artist.name,
-    "genres": artist.genres,
-    "city": artist.city,
-    "state": artist.state,
-    "phone": artist.phone,
-    "website": artist.website_link,
-    "facebook_link": artist.facebook_link,
-    "seeking_venue": artist.seeking_venues,
-    "seeking_description": artist.venue_description,
-    "image_link": artist.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows),
-  }
-  return render_template('pages/show_artist.html', artist=data)
-
-#  Update
-#  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
-def edit_artist(artist_id):
-  form = ArtistForm()
-  requested_artist = Artist.query.get(artist_id)
-  artist={
-    "id": requested_artist.id,
-    "name": requested_artist.name,
-    "genres": requested_artist.genres,
-    "city": requested_artist.city ,
-    "state": requested_artist.state,
-    "phone": requested_artist.phone,
-    "website": requested_artist.website_link,
-    "facebook_link": requested_artist.facebook_link,
-    "seeking_venue": requested_artist.seeking_venues,
-    "seeking_description": requested_artist.venue_description,
-    "image_link": requested_artist.image_link
-  }
-  return render_template('forms/edit_artist.html', form=form, artist=artist)
-
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
-def edit_artist_submission(artist_id):
-  # artist record with ID <artist_id> using the new attributes
-  try:
-    artist = Artist.query.get(artist_id)
-    artist.name = request.form['name']
-    artist.city = request.form['city']
-    artist.state = request.form['state']
-    artist.phone = request.form['phone']
-    artist.genres = request.form.getlist('genres')
-    artist.image_link = request.form['image_link']
-    artist.facebook_link = request.form['facebook_link']
-    artist.website_link = request.form['website_link']
-    artist.seeking_venues = True if 'seeking_venue' in request.form else False 
-    artist.venue_description = request.form['seeking_description']
-    db.session.add(artist)
-    db.session.commit()
+      flash('Artist ' + request.form.get('name', '') + ' was changed by someone else while you were editing it. '
+            'Review the current details and save again.')
+      return redirect(url_for('edit_artist', artist_id=artist_id))
+    except:
+      db.session.rollback()
+      app.logger.exception('could not edit artist %s', artist_id)
+      flash('An error occurred. Artist ' + request.form.get('name', '') + ' could not be edited.')
+      return redirect(url_for('show_artist', artist_id=artist_id))
+    if artist is None:
+      abort(404)
   # on successful db insert, flash success
     flash('Artist ' + request.form['name'] + ' was successfully edited!')
-  except:
-    db.session.rollback()
-    print(sys.exc_info())
-    flash('An error occurred. Artist ' + artist.name + ' could not be edited.')
-  finally:
-    db.session.close()
-
-  return redirect(url_for('show_artist', artist_id=artist_id))
-
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
-def edit_venue(venue_id):
-  form = VenueForm()
-  requested_venue = Venue.query.get(venue_id)
-  venue={
-    "id": requested_venue.id,
-    "name": requested_venue.name,
-    "genres": requested_venue.genres,
-    "address": requested_venue.address,
-    "city": requested_venue.city,
-    "state": requested_venue.state,
-    "phone": requested_venue.phone,
-    "website": requested_venue.website_link,
-    "facebook_link": requested_venue.facebook_link,
-    "seeking_talent": requested_venue.seeking_talent,
-    "seeking_description": requested_venue.talent_description,
-    "image_link": requested_venue.image_link
-  }
-  return render_template('forms/edit_venue.html', form=form, venue=venue)
-
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
-def edit_venue_submission(venue_id):
-  try:
-    venue = Venue.query.get(venue_id)
-    venue.name = request.form['name']
-    venue.city = request.form['city']
-    venue.state = request.form['state']
-    venue.address = request.form['address']
-    venue.phone = request.form['phone']
-    venue.genres = request.form.getlist('genres')
-    venue.image_link = request.form['image_link']
-    venue.facebook_link = request.form['facebook_link']
-    venue.website_link = request.form['website_link']
-    venue.seeking_talent = True if 'seeking_talent' in request.form else False 
-    venue.talent_description = request.form['seeking_description']
-    db.session.add(venue)
-    db.session.commit()
-  # on successful db insert, flash success
-    flash('Venue ' + venue.name + ' was successfully edited!')
-  except:
-    db.session.rollback()
-    print(sys.exc_info())
-    flash('An error occurred. Venue ' + venue.name + ' could not be edited.')
-  finally:
-    db.session.close()
-  return redirect(url_for('show_venue', venue_id=venue_id))
-
-#  Create Artist
-#  ----------------------------------------------------------------
-
-@app.route('/artists/create', methods=['GET'])
-def create_artist_form():
-  form = ArtistForm()
-  return render_template('forms/new_artist.html', form=form)
-
-@app.route('/artists/create', methods=['POST'])
-def create_artist_submission():
-  # called upon submitting the new artist listing form
-  try:
-    artist = Artist()
-    artist.name = request.form['name']
-    artist.city = request.form['city']
-    artist.state = request.form['state']
-    artist.phone = request.form['phone']
-    artist.genres = request.form.getlist('genres')
-    artist.image_link = request.form['image_link']
-    artist.facebook_link = request.form['facebook_link']
-    artist.website_link = request.form['website_link']
-    artist.seeking_venues = True if 'seeking_venue' in request.form else False
-    artist.venue_description = request.form['seeking_description']
-    db.session.add(artist)
-    db.session.commit()
-  #on successful db insert, flash success
-    flash('Artist ' + artist.name + ' was successfully listed!')
-  except:
-    db.session.rollback()
-    print(sys.exc_info())
-    flash('An error occurred. Artist ' + artist.name + ' could not be listed.')
-  finally:
-    db.session.close()
-  return render_template('pages/home.html')
-
-
-#  Shows
-#  ----------------------------------------------------------------
-
-@app.route('/shows')
-def shows():
-  # displays list of shows at /shows
-  data = list()
-  shows = Show.query.join(Artist).join(Venue).all()
-  for show in shows:
-    data.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_date
-    })
-  return render_template('pages/shows.html', shows=data)
-
-@app.route('/shows/create')
-def create_shows():
-  # renders form. do not touch.
-  form = ShowForm()
-  return render_template('forms/new_show.html', form=form)
-
-@app.route('/shows/create', methods=['POST'])
-def create_show_submission():
-  # called to create new shows in the db, upon submitting new show listing form
-  try:
-    venue_id = request.form['venue_id']
-    artist_id = request.form['artist_id']
-    show = Show(artist_id=artist_id , venue_id=venue_id , start_date=request.form['start_time'])
+
+    return redirect(url_for('show_artist', artist_id=artist_id))
+
+  @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+  def edit_venue(venue_id):
+    from forms import VenueForm
+    requested_venue = Venue.query.get_or_404(venue_id)
+    form = VenueForm(data=form_data(Venue, requested_venue))
+    venue={
+      "id": requested_venue.id,
+      "name": requested_venue.name,
+      "genres": requested_venue.genres,
+      "address": requested_venue.address,
+      "city": requested_venue.city,
+      "state": requested_venue.state,
+      "phone": requested_venue.phone,
+      "website": requested_venue.website_link,
+      "facebook_link": requested_venue.facebook_link,
+      "seeking_talent": requested_venue.seeking_talent,
+      "seeking_description": requested_venue.talent_description,
+      "image_link": requested_venue.image_link
+    }
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+  @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+  def edit_venue_submission(venue_id):
+    try:
+      venue, changed = save_edits(Venue, venue_id, request.form)
+      if changed:
+        if changed.keys() & {'name', 'city', 'state'}:
+          refresh_areas([(venue['city'], venue['state']),
+                         (changed.get('city', venue['city']), changed.get('state', venue['state']))])
+        if 'genres' in changed:
+          count_genres(Venue, added=changed['genres'], removed=venue['genres'])
+        db.session.commit()
+        page_cache.bump('venue')
+        if 'name' in changed:
+          typeahead.put('venues', venue_id, changed['name'])
+    except OutdatedForm:
+      db.session.rollback()
+      flash('The form was out of date. Review the details of venue ' + request.form.get('name', '') +
+            ' and save again.')
+      return redirect(url_for('edit_venue', venue_id=venue_id))
+    except EditConflict:
+      db.session.rollback()
+      flash('Venue ' + request.form.get('name', '') + ' was changed by someone else while you were editing it. '
+            'Review the current details and save again.')
+      return redirect(url_for('edit_venue', venue_id=venue_id))
+    except:
+      db.session.rollback()
+      app.logger.exception('could not edit venue %s', venue_id)
+      flash('An error occurred. Venue ' + request.form.get('name', '') + ' could not be edited.')
+      return redirect(url_for('show_venue', venue_id=venue_id))
+    if venue is None:
+      abort(404)
   # on successful db insert, flash success
-    db.session.add(show)
-    db.session.commit()
-    flash('Show was successfully listed!')
-  except:
-    db.session.rollback()
-    print(sys.exc_info())
-    flash('An error occurred. Show could not be listed.')
-  finally:
-    db.session.close()
-  return render_template('pages/home.html')
-
-@app.errorhandler(404)
-def not_found_error(error):
-    return render_template('errors/404.html'), 404
-
-@app.errorhandler(500)
-def server_error(error):
-    return render_template('errors/500.html'), 500
-
-
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+    flash('Venue ' + request.form['name'] + ' was successfully edited!')
+    return redirect(url_for('show_venue', venue_id=venue_id))
+
+  #  Create Artist
+  #  ----------------------------------------------------------------
+
+  @app.route('/artists/create', methods=['GET'])
+  def create_artist_form():
+    from forms import ArtistForm
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+  @app.route('/artists/create', methods=['POST'])
+  def create_artist_submission():
+    # called upon submitting the new artist listing form
+    try:
+      artist = Artist()
+      artist.name = request.form['name']
+      artist.city = request.form['city']
+      artist.state = request.form['state']
+      artist.phone = request.form['phone']
+      artist.genres = request.form.getlist('genres')
+      artist.image_link = request.form['image_link']
+      artist.facebook_link = request.form['facebook_link']
+      artist.website_link = request.form['website_link']
+      artist.seeking_venues = True if 'seeking_venue' in request.form else False
+      artist.venue_description = request.form['seeking_description']
+      db.session.add(artist)
+      count_genres(Artist, added=artist.genres)
+      db.session.commit()
+      page_cache.bump('artist')
+      typeahead.put('artists', artist.id, artist.name)
+    #on successful db insert, flash success
+      flash('Artist ' + artist.name + ' was successfully listed!')
+    except:
+      db.session.rollback()
+      app.logger.exception('could not list artist')
+      flash('An error occurred. Artist ' + artist.name + ' could not be listed.')
+    return render_template('pages/home.html')
+
+
+  #  Shows
+  #  ----------------------------------------------------------------
+
+  @app.route('/shows')
+  @cached_page('show', 'venue', 'artist')
+  def shows():
+    # displays list of shows at /shows, one keyset page at a time
+    try:
+      after = parse_show_cursor(request.args.get('after'))
+    except ValueError:
+      abort(400)
+    limit = request.args.get('limit', SHOWS_PER_PAGE, type=int)
+    return stream_template('pages/shows.html', shows=shows_page(after, limit))
+
+  @app.route('/shows/create')
+  def create_shows():
+    # renders form. do not touch.
+    from forms import ShowForm
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+  @app.route('/shows/create', methods=['POST'])
+  def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    from forms import ShowForm
+    # validated like an imported row: a bad start time or duration never reaches the booking ranges
+    form = ShowForm(meta={'csrf': False})
+    if not form.validate():
+      flash('Show could not be listed. ' + ' '.join(
+        '{}: {}'.format(field, ' '.join(errors)) for field, errors in form.errors.items()))
+      return render_template('pages/home.html')
+    try:
+      book_show(artist_id=int(form.artist_id.data),
+                venue_id=int(form.venue_id.data),
+                start_date=form.start_time.data,
+                duration=form.duration.data)
+      page_cache.bump('show')
+    # on successful db insert, flash success
+      flash('Show was successfully listed!')
+    except BookingConflict as conflict:
+      flash('Show could not be listed. ' + str(conflict))
+    except:
+      db.session.rollback()
+      app.logger.exception('could not list show')
+      flash('An error occurred. Show could not be listed.')
+    return render_template('pages/home.html')
+
+  #  API
+  #  ----------------------------------------------------------------
+
+  @app.route('/api/venues/<int:venue_id>')
+  def api_venue(venue_id):
+    now = datetime.now()
+    def build():
+      venue = venue_detail(venue_id, now)
+      venue["past_shows"] = serialize_shows(venue["past_shows"])
+      venue["upcoming_shows"] = serialize_shows(venue["upcoming_shows"])
+      return venue
+    response = conditional_json(venue_version(venue_id, now), build)
+    if response is None:
+      abort(404)
+    return response
+
+  @app.route('/api/artists/<int:artist_id>')
+  def api_artist(artist_id):
+    now = datetime.now()
+    def build():
+      artist = artist_detail(artist_id, now)
+      artist["past_shows"] = serialize_shows(artist["past_shows"])
+      artist["upcoming_shows"] = serialize_shows(artist["upcoming_shows"])
+      return artist
+    response = conditional_json(artist_version(artist_id, now), build)
+    if response is None:
+      abort(404)
+    return response
+
+  @app.route('/api/shows')
+  def api_shows():
+    try:
+      after = parse_show_cursor(request.args.get('after'))
+    except ValueError:
+      abort(400)
+    limit = request.args.get('limit', SHOWS_PER_PAGE, type=int)
+    def build():
+      page = shows_page(after, limit)
+      shows = serialize_shows(page)
+      return {"shows": shows, "next": page.next_cursor}
+    return conditional_json(shows_version(after, limit), build)
+
+  @app.route('/api/typeahead/<kind>')
+  def api_typeahead(kind):
+    # artists or venues whose name has a word starting with ?q=, for the show form
+    matches = typeahead.match(kind, request.args.get('q', ''), request.args.get('limit', type=int))
+    if matches is None:
+      abort(404)
+    return jsonify({"data": matches})
+
+  #  Stats
+  #  ----------------------------------------------------------------
+
+  @app.route('/cache/stats')
+  def cache_stats():
+    return jsonify(page_cache.stats())
+
+  @app.route('/pool/stats')
+  def pool_status():
+    return jsonify(pool_stats.stats(db.engine.pool))
+
+  @app.route('/metrics')
+  def metrics():
+    summary = request_metrics.summary()
+    logs = app.extensions.get('fyyur_logs')
+    summary["log_records_dropped"] = logs.dropped if logs is not None else 0
+    return jsonify(summary)
+
+  @app.errorhandler(404)
+  def not_found_error(error):
+      return render_template('errors/404.html'), 404
+
+  @app.errorhandler(500)
+  def server_error(error):
+      return render_template('errors/500.html'), 500
+
+  if not app.debug:
+    configure_logging(app)
+
+  return app
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -476,11 +491,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,52 @@
+"""Time the booking overlap check as a venue's history grows.
+
+Compares Timeline.overlaps (bisect over sorted starts) with scanning every
+earlier show, for histories of increasing length:
+
+    python bench_booking.py --shows 1000 10000 100000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from booking import Timeline
+
+
+def history(count, rng):
+  start = datetime(2020, 1, 1, 20)
+  days = rng.sample(range(count * 2), count)
+  return [(start + timedelta(days=day), start + timedelta(days=day, hours=2)) for day in days]
+
+
+def scan(intervals, start, end):
+  return any(s < end and e > start for s, e in intervals)
+
+
+def per_check_us(check, probes):
+  started = time.perf_counter()
+  for start, end in probes:
+    check(start, end)
+  return 1e6 * (time.perf_counter() - started) / len(probes)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--shows', type=int, nargs='+', default=[1000, 10000, 100000])
+  parser.add_argument('--probes', type=int, default=200)
+  args = parser.parse_args()
+
+  rng = random.Random(0)
+  print('{:>8} {:>16} {:>16}'.format('shows', 'timeline us', 'scan us'))
+  for count in args.shows:
+    intervals = history(count, rng)
+    timeline = Timeline(intervals)
+    probes = [(start + timedelta(hours=1), end + timedelta(hours=1))
+              for start, end in rng.sample(intervals, min(args.probes, count))]
+    print('{:>8} {:>16.2f} {:>16.2f}'.format(
+      count, per_check_us(timeline.overlaps, probes),
+      per_check_us(lambda start, end: scan(intervals, start, end), probes)))
+
+
+if __name__ == '__main__':
+  main()
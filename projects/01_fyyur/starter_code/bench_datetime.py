@@ -0,0 +1,75 @@
+"""Micro-benchmark for the `datetime` Jinja filter.
+
+Compares the filter as it used to be (pattern rebuilt and babel called on
+every value) with filters.format_datetime and the batch format_datetimes.
+
+    python bench_datetime.py --values 500 --repeat 20
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+import babel.dates
+import dateutil.parser
+
+import filters
+from filters import format_datetime, format_datetimes
+
+
+def old_format_datetime(value, format='medium'):
+  # the filter this module replaced
+  if isinstance(value, str):
+    date = dateutil.parser.parse(value)
+  else:
+    date = value
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+
+def best_of(fn, repeat, cold=False):
+  best = None
+  for _ in range(repeat):
+    if cold:
+      # forget previously formatted values, keep the compiled patterns
+      filters._format.cache_clear()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--values', type=int, default=500)
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args()
+
+  rng = random.Random(0)
+  start = datetime(2021, 1, 1, 20, 0)
+  values = [start + timedelta(days=rng.randrange(730), hours=rng.randrange(4))
+            for _ in range(args.values)]
+  strings = [value.isoformat() for value in values]
+  assert [old_format_datetime(v, 'full') for v in values] == \
+    [format_datetime(v, 'full') for v in values]
+
+  cases = [
+    ('old filter, datetime', lambda: [old_format_datetime(v, 'full') for v in values]),
+    ('old filter, string', lambda: [old_format_datetime(v, 'full') for v in strings]),
+    ('format_datetime, cold', lambda: [format_datetime(v, 'full') for v in values], True),
+    ('format_datetime', lambda: [format_datetime(v, 'full') for v in values]),
+    ('format_datetime, string', lambda: [format_datetime(v, 'full') for v in strings]),
+    ('format_datetimes', lambda: format_datetimes(values, 'full')),
+  ]
+  print('{:<26} {:>12} {:>12}'.format('case', 'total ms', 'us/value'))
+  for name, fn, *cold in cases:
+    elapsed = best_of(fn, args.repeat, *cold)
+    print('{:<26} {:>12.2f} {:>12.2f}'.format(
+      name, elapsed * 1000, elapsed * 1e6 / args.values))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,79 @@
+"""Show that request latency does not depend on log volume or disk speed.
+
+A throwaway route logs N records per request. Its latency is measured with
+the old setup (a FileHandler writing on the request thread) and with
+logs.configure_logging (queued, written by a background thread), against a
+handler that sleeps to emulate a slow disk.
+
+    python bench_logging.py --disk-ms 0 1 5 --records 0 10 100
+"""
+import argparse
+import logging
+import statistics
+import time
+from flask import Flask
+from flask.logging import default_handler
+
+from logs import configure_logging
+
+
+class SlowDisk(logging.Handler):
+  # stands in for a file handler on a slow or busy disk
+
+  def __init__(self, delay):
+    logging.Handler.__init__(self)
+    self.delay = delay
+
+  def emit(self, record):
+    self.format(record)
+    time.sleep(self.delay)
+
+
+def make_app(name):
+  bench_app = Flask(name)
+
+  @bench_app.route('/log/<int:records>')
+  def log(records):
+    for i in range(records):
+      bench_app.logger.info('record %d of %d', i, records)
+    return 'ok'
+
+  return bench_app
+
+
+def p50_ms(client, records, repeat):
+  latencies = list()
+  for _ in range(repeat):
+    started = time.perf_counter()
+    client.get('/log/{}'.format(records))
+    latencies.append(1000 * (time.perf_counter() - started))
+  return statistics.median(latencies)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--disk-ms', type=float, nargs='+', default=[0, 1, 5])
+  parser.add_argument('--records', type=int, nargs='+', default=[0, 10, 100])
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args()
+
+  print('{:>8} {:>8} {:>14} {:>14}'.format('disk ms', 'records', 'sync p50 ms', 'queued p50 ms'))
+  for disk_ms in args.disk_ms:
+    sync_app = make_app('sync_{}'.format(disk_ms))
+    sync_app.logger.setLevel(logging.INFO)
+    sync_app.logger.removeHandler(default_handler)
+    sync_app.logger.addHandler(SlowDisk(disk_ms / 1000))
+
+    queued_app = make_app('queued_{}'.format(disk_ms))
+    configure_logging(queued_app, SlowDisk(disk_ms / 1000))
+    logging.getLogger('fyyur').handlers.clear()
+
+    for records in args.records:
+      print('{:>8} {:>8} {:>14.3f} {:>14.3f}'.format(
+        disk_ms, records,
+        p50_ms(sync_app.test_client(), records, args.repeat),
+        p50_ms(queued_app.test_client(), records, args.repeat)))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,213 @@
+"""Benchmark every Fyyur route through the Flask test client.
+
+Seeds a synthetic catalog (see seed.py) into the database named by
+DATABASE_URL -- an in-memory SQLite database by default, or e.g. a local
+Postgres -- then requests each route repeatedly and reports p50/p95
+latency, SQL statements per request and peak Python memory per request.
+Results are saved as JSON so runs can be compared:
+
+    python bench_routes.py --shows 50000 --output before.json
+    python bench_routes.py --shows 50000 --output after.json --compare before.json
+
+The page cache is cleared before every request unless --cache is given.
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from sqlalchemy import event
+from app import create_app
+from models import db, Venue, Artist, SHOW_MINUTES
+from cache import page_cache
+import seed
+
+app = create_app()
+
+
+def _venue_form(name):
+  return {
+    'name': name, 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+    'phone': '512-555-0100', 'genres': ['Jazz', 'Blues'],
+    'image_link': 'https://images.example.com/bench.jpg',
+    'facebook_link': 'https://www.facebook.com/bench',
+    'website_link': 'https://bench.example.com', 'seeking_description': ''
+  }
+
+
+def _artist_form(name):
+  form = _venue_form(name)
+  del form['address']
+  return form
+
+
+def _scratch_venue():
+  venue = Venue(name='Scratch Venue', city='Austin', state='TX', genres=['Jazz'])
+  db.session.add(venue)
+  db.session.commit()
+  venue_id = venue.id
+  db.session.remove()
+  return venue_id
+
+
+def _bookings(venue_id, artist_id):
+  # a show form factory; every booking starts after the last one ended, past
+  # the seeded shows, so each request books instead of hitting BookingConflict
+  first = datetime.now().replace(microsecond=0) + timedelta(days=365)
+  starts = itertools.count()
+  def form():
+    start = first + timedelta(minutes=(SHOW_MINUTES + 60) * next(starts))
+    return {'artist_id': artist_id, 'venue_id': venue_id,
+            'start_time': start.strftime('%Y-%m-%d %H:%M:%S')}
+  return form
+
+
+def _edits(model, id, form):
+  # an edit form factory; each submission renames the row and carries its
+  # current version, so it is saved rather than refused as an EditConflict
+  names = itertools.count()
+  def edit():
+    version = db.session.query(model.version).filter(model.id == id).scalar()
+    db.session.remove()
+    return dict(form, name='{} {}'.format(form['name'], next(names)), version=version)
+  return edit
+
+
+def routes(venue_id, artist_id):
+  # (name, method, path or path factory, form data or form factory)
+  return [
+    ('index', 'GET', '/', None),
+    ('venues', 'GET', '/venues', None),
+    ('search_venues', 'POST', '/venues/search', {'search_term': 'hall'}),
+    ('show_venue', 'GET', '/venues/{}'.format(venue_id), None),
+    ('create_venue_form', 'GET', '/venues/create', None),
+    ('create_venue_submission', 'POST', '/venues/create', _venue_form('Bench Venue')),
+    ('delete_venue', 'DELETE', lambda: '/venues/{}'.format(_scratch_venue()), None),
+    ('artists', 'GET', '/artists', None),
+    ('search_artists', 'POST', '/artists/search', {'search_term': 'band'}),
+    ('show_artist', 'GET', '/artists/{}'.format(artist_id), None),
+    ('edit_artist', 'GET', '/artists/{}/edit'.format(artist_id), None),
+    ('edit_artist_submission', 'POST', '/artists/{}/edit'.format(artist_id),
+     _edits(Artist, artist_id, _artist_form('Bench Artist'))),
+    ('edit_venue', 'GET', '/venues/{}/edit'.format(venue_id), None),
+    ('edit_venue_submission', 'POST', '/venues/{}/edit'.format(venue_id),
+     _edits(Venue, venue_id, _venue_form('Bench Venue'))),
+    ('create_artist_form', 'GET', '/artists/create', None),
+    ('create_artist_submission', 'POST', '/artists/create', _artist_form('Bench Artist')),
+    ('shows', 'GET', '/shows', None),
+    ('create_shows', 'GET', '/shows/create', None),
+    ('create_show_submission', 'POST', '/shows/create', _bookings(venue_id, artist_id)),
+    ('api_venue', 'GET', '/api/venues/{}'.format(venue_id), None),
+    ('api_artist', 'GET', '/api/artists/{}'.format(artist_id), None),
+    ('api_shows', 'GET', '/api/shows', None),
+    ('api_typeahead', 'GET', '/api/typeahead/artists?q=the', None),
+    ('cache_stats', 'GET', '/cache/stats', None),
+    ('pool_stats', 'GET', '/pool/stats', None),
+    ('metrics', 'GET', '/metrics', None),
+  ]
+
+
+def percentile(values, fraction):
+  ordered = sorted(values)
+  return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(client, method, path, data, repeat, keep_cache):
+  statements = list()
+
+  def before_cursor_execute(*args):
+    statements.append(1)
+
+  latencies = list()
+  queries = list()
+  status = None
+  event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+  try:
+    for i in range(repeat + 1):
+      url = path() if callable(path) else path
+      form = data() if callable(data) else data
+      if not keep_cache:
+        page_cache.clear()
+      del statements[:]
+      if i == repeat:
+        # one extra request under tracemalloc for the memory peak
+        tracemalloc.start()
+      started = time.perf_counter()
+      response = client.open(url, method=method, data=form)
+      response.get_data()
+      elapsed = time.perf_counter() - started
+      status = response.status_code
+      if i == repeat:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+      else:
+        latencies.append(elapsed * 1000)
+        queries.append(len(statements))
+  finally:
+    event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+  return {
+    'status': status,
+    'p50_ms': percentile(latencies, 0.50),
+    'p95_ms': percentile(latencies, 0.95),
+    'queries': statistics.mean(queries),
+    'peak_kb': peak / 1024,
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--venues', type=int, default=500)
+  parser.add_argument('--artists', type=int, default=1500)
+  parser.add_argument('--shows', type=int, default=10000)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--repeat', type=int, default=20)
+  parser.add_argument('--cache', action='store_true', help='keep the page cache enabled')
+  parser.add_argument('--output', help='write results to this JSON file')
+  parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+  args = parser.parse_args()
+
+  app.config['WTF_CSRF_ENABLED'] = False
+  with app.app_context():
+    db.create_all()
+    venue_ids, artist_ids, _ = seed.generate(args.venues, args.artists, args.shows, args.seed)
+    client = app.test_client()
+    results = dict()
+    for name, method, path, data in routes(venue_ids[0], artist_ids[0]):
+      results[name] = measure(client, method, path, data, args.repeat, args.cache)
+
+  previous = dict()
+  if args.compare:
+    with open(args.compare) as source:
+      previous = json.load(source)['routes']
+  print('{:<26} {:>6} {:>9} {:>9} {:>8} {:>10}{}'.format(
+    'route', 'status', 'p50 ms', 'p95 ms', 'queries', 'peak KiB',
+    '  p50 vs before' if previous else ''))
+  for name, result in results.items():
+    change = ''
+    if name in previous and previous[name]['p50_ms']:
+      change = '  {:+.0%}'.format(result['p50_ms'] / previous[name]['p50_ms'] - 1)
+    print('{:<26} {:>6} {:>9.2f} {:>9.2f} {:>8.1f} {:>10.1f}{}'.format(
+      name, result['status'], result['p50_ms'], result['p95_ms'],
+      result['queries'], result['peak_kb'], change))
+
+  if args.output:
+    with open(args.output, 'w') as out:
+      json.dump({
+        'created': datetime.now().isoformat(),
+        'database': db.engine.dialect.name,
+        'catalog': {'venues': args.venues, 'artists': args.artists, 'shows': args.shows,
+                    'seed': args.seed},
+        'repeat': args.repeat,
+        'cache': args.cache,
+        'routes': results,
+      }, out, indent=2)
+
+
+if __name__ == '__main__':
+  main()
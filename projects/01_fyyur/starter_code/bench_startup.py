@@ -0,0 +1,115 @@
+"""Measure cold start: importing the app, building it and serving a request.
+
+Each run is a fresh interpreter started with -X importtime. It reports the
+time to import app.py, to call create_app() and to serve the first request
+for '/', plus the modules app.py imports that cost the most. The median of
+--runs runs is reported, and results can be saved and compared the same way
+as bench_routes.py:
+
+    python bench_startup.py --output before.json
+    python bench_startup.py --output after.json --compare before.json
+
+Trees from before create_app() existed are measured through their
+module-level `app`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+CHILD = '''
+import json, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+app = module.create_app() if hasattr(module, 'create_app') else module.app
+created = time.perf_counter()
+app.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+  'import_ms': 1000 * (imported - started),
+  'create_ms': 1000 * (created - imported),
+  'first_request_ms': 1000 * (served - created),
+  'total_ms': 1000 * (served - started),
+}))
+'''
+
+PHASES = ['import_ms', 'create_ms', 'first_request_ms', 'total_ms']
+
+
+def run_once():
+  env = dict(os.environ)
+  env.setdefault('DATABASE_URL', 'sqlite://')
+  child = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD], env=env,
+                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                         capture_output=True, text=True, check=True)
+  timings = json.loads(child.stdout.strip().splitlines()[-1])
+  # "import time: self | cumulative | <indent>name", two more spaces of indent
+  # per level; a module's own imports are listed just before it
+  modules = dict()
+  pending = dict()
+  for line in child.stderr.splitlines():
+    if not line.startswith('import time:') or 'cumulative' in line:
+      continue
+    _, cumulative, name = line.split('|')
+    depth = (len(name) - len(name.lstrip(' ')) + 1) // 2
+    if depth == 2:
+      pending[name.strip()] = int(cumulative) / 1000
+    elif depth == 1:
+      if name.strip() == 'app':
+        modules = pending
+      pending = dict()
+  return timings, modules
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--runs', type=int, default=5)
+  parser.add_argument('--top', type=int, default=12, help='imports of app.py to list')
+  parser.add_argument('--output', help='write results to this JSON file')
+  parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+  args = parser.parse_args()
+
+  phases = defaultdict(list)
+  modules = defaultdict(list)
+  for _ in range(args.runs):
+    timings, imported = run_once()
+    for phase in PHASES:
+      phases[phase].append(timings[phase])
+    for name, ms in imported.items():
+      modules[name].append(ms)
+  results = {phase: statistics.median(values) for phase, values in phases.items()}
+  heaviest = sorted(((statistics.median(values), name) for name, values in modules.items()),
+                    reverse=True)[:args.top]
+
+  previous = dict()
+  if args.compare:
+    with open(args.compare) as source:
+      previous = json.load(source)['phases']
+  print('{:<18} {:>10}{}'.format('phase', 'median ms', '  vs before' if previous else ''))
+  for phase in PHASES:
+    change = ''
+    if previous.get(phase, 0) >= 1:
+      change = '  {:+.0%}'.format(results[phase] / previous[phase] - 1)
+    print('{:<18} {:>10.1f}{}'.format(phase, results[phase], change))
+  print()
+  print('{:<30} {:>10}'.format('imported by app.py', 'median ms'))
+  for ms, name in heaviest:
+    print('{:<30} {:>10.1f}'.format(name, ms))
+
+  if args.output:
+    with open(args.output, 'w') as out:
+      json.dump({
+        'created': datetime.now().isoformat(),
+        'runs': args.runs,
+        'phases': results,
+        'imports': {name: ms for ms, name in heaviest},
+      }, out, indent=2)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,51 @@
+"""Time typeahead lookups against an index of N artist names.
+
+Builds a NameIndex over names shaped like the seed generator's (see
+seed.py) and reports p50/p95 per lookup for prefixes of one to four
+characters, plus the cost of a rename while the index is live:
+
+    python bench_typeahead.py --names 100000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from seed import NAME_WORDS, ARTIST_KINDS
+from typeahead import NameIndex
+
+
+def timed_us(fn, args):
+  latencies = list()
+  for arg in args:
+    started = time.perf_counter()
+    fn(*arg)
+    latencies.append(1e6 * (time.perf_counter() - started))
+  latencies.sort()
+  return statistics.median(latencies), latencies[int(0.95 * (len(latencies) - 1))]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--names', type=int, default=100000)
+  parser.add_argument('--lookups', type=int, default=1000)
+  parser.add_argument('--limit', type=int, default=10)
+  args = parser.parse_args()
+
+  rng = random.Random(0)
+  names = ['The {} {} {}'.format(rng.choice(NAME_WORDS), rng.choice(ARTIST_KINDS), i)
+           for i in range(args.names)]
+  started = time.perf_counter()
+  index = NameIndex(enumerate(names, 1))
+  print('built {} names in {:.0f}ms'.format(len(index), 1000 * (time.perf_counter() - started)))
+
+  print('{:>8} {:>10} {:>10}'.format('prefix', 'p50 us', 'p95 us'))
+  for length in range(1, 5):
+    prefixes = [(rng.choice(names).split()[1][:length], args.limit) for _ in range(args.lookups)]
+    print('{:>8} {:>10.1f} {:>10.1f}'.format(length, *timed_us(index.match, prefixes)))
+  renames = [(rng.randint(1, args.names), 'Renamed {}'.format(i)) for i in range(args.lookups)]
+  print('{:>8} {:>10.1f} {:>10.1f}'.format('rename', *timed_us(index.put, renames)))
+
+
+if __name__ == '__main__':
+  main()
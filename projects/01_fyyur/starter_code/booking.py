@@ -0,0 +1,252 @@
+#----------------------------------------------------------------------------#
+# Booking.
+#
+# A venue or an artist can only play one show at a time: a booking whose
+# [start, start + duration) overlaps another show of the same venue or artist
+# is rejected with BookingConflict.
+#   * Postgres: an exclusion constraint per side on
+#     tsrange(start_date, start_date + duration minutes), backed by a GiST
+#     index (see migrations/versions/e2f9b4c17a63_.py). The conflict lookup
+#     runs on that index and the constraint settles concurrent bookings.
+#   * SQLite: an in-process Timeline per venue and artist, loaded from the
+#     (venue_id/artist_id, start_date) indexes on first use and kept up to
+#     date by book_show(). Bookings are serialized on a lock. Code that writes
+#     Shows behind book_show()'s back must call timelines.clear().
+# Bulk imports check a batch at a time with split_overlaps(), against the
+# same index or timelines and against the batch's own earlier rows.
+#----------------------------------------------------------------------------#
+
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import DDL, event, func, literal_column, or_
+from sqlalchemy.exc import IntegrityError
+from models import db, Show, SHOW_MINUTES
+from counters import record_show
+
+SIDES = {
+  'venue': Show.venue_id,
+  'artist': Show.artist_id,
+}
+
+# Postgres exclusion constraint name -> side
+CONSTRAINTS = {
+  'ex_shows_venue_booking': 'venue',
+  'ex_shows_artist_booking': 'artist',
+}
+
+EXCLUDE = ('ALTER TABLE "Shows" ADD CONSTRAINT {} EXCLUDE USING gist ({} WITH =, '
+           "tsrange(start_date, start_date + duration * interval '1 minute') WITH &&)")
+
+# create_all() gets the constraints too; the migration adds them to existing databases
+event.listen(Show.__table__, 'after_create', DDL(
+  'CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+for _constraint, _side in CONSTRAINTS.items():
+  event.listen(Show.__table__, 'after_create', DDL(
+    EXCLUDE.format(_constraint, SIDES[_side].key)).execute_if(dialect='postgresql'))
+
+
+class BookingConflict(Exception):
+
+  def __init__(self, side):
+    super().__init__('The {} is already booked at that time.'.format(side))
+    self.side = side
+
+
+class Timeline:
+  """The shows of one venue or artist as intervals sorted by start.
+
+  reach[i] is the latest end among the first i + 1 intervals, so an overlap
+  check is one bisect even if old data holds overlapping shows.
+  """
+
+  __slots__ = ('starts', 'reach')
+
+  def __init__(self, intervals=()):
+    self.starts = list()
+    self.reach = list()
+    for start, end in sorted(intervals):
+      self.starts.append(start)
+      self.reach.append(max(end, self.reach[-1]) if self.reach else end)
+
+  def __len__(self):
+    return len(self.starts)
+
+  def overlaps(self, start, end):
+    # any interval that starts before `end` and ends after `start`
+    before = bisect_left(self.starts, end)
+    return before > 0 and self.reach[before - 1] > start
+
+  def add(self, start, end):
+    position = bisect_left(self.starts, start)
+    if position and self.reach[position - 1] > end:
+      end = self.reach[position - 1]
+    self.starts.insert(position, start)
+    self.reach.insert(position, end)
+    for later in range(position + 1, len(self.reach)):
+      if self.reach[later] >= end:
+        break
+      self.reach[later] = end
+
+
+class Timelines:
+
+  def __init__(self):
+    self.lock = threading.RLock()
+    self._timelines = dict()
+
+  def get(self, side, owner_id):
+    key = (side, owner_id)
+    timeline = self._timelines.get(key)
+    if timeline is None:
+      rows = db.session.query(Show.start_date, Show.duration).filter(SIDES[side] == owner_id)
+      timeline = Timeline((start, start + timedelta(minutes=minutes)) for start, minutes in rows)
+      self._timelines[key] = timeline
+    return timeline
+
+  def forget(self, side, owner_ids):
+    # drop timelines whose shows were removed; they are reloaded on next use
+    with self.lock:
+      for owner_id in owner_ids:
+        self._timelines.pop((side, owner_id), None)
+
+  def clear(self):
+    with self.lock:
+      self._timelines.clear()
+
+
+timelines = Timelines()
+
+
+def _span(model=Show):
+  # must match the expression in the exclusion constraints
+  return func.tsrange(model.start_date,
+                      model.start_date + model.duration * literal_column("interval '1 minute'"))
+
+
+def _booked_side(show):
+  # the side that already has a show overlapping `show`, on the GiST indexes
+  overlapping = db.session.query(Show.venue_id, Show.artist_id).filter(
+    or_(Show.venue_id == show.venue_id, Show.artist_id == show.artist_id),
+    _span().op('&&')(func.tsrange(show.start_date, show.end_date))
+  ).first()
+  if overlapping is None:
+    return None
+  return 'venue' if overlapping.venue_id == show.venue_id else 'artist'
+
+
+def conflict_side(error):
+  # the side whose exclusion constraint `error` (SQLAlchemy's or the driver's) violated
+  error = getattr(error, 'orig', error)
+  return CONSTRAINTS.get(getattr(getattr(error, 'diag', None), 'constraint_name', None))
+
+
+def _existing(rows, spans):
+  # {(side, owner id): Timeline} of the stored shows near the rows, on the GiST indexes
+  owners = {side: {row[column.key] for row in rows} for side, column in SIDES.items()}
+  window = func.tsrange(min(start for start, _ in spans), max(end for _, end in spans))
+  intervals = defaultdict(list)
+  for venue_id, artist_id, start, minutes in db.session.query(
+      Show.venue_id, Show.artist_id, Show.start_date, Show.duration).filter(
+      or_(Show.venue_id.in_(owners['venue']), Show.artist_id.in_(owners['artist'])),
+      _span().op('&&')(window)):
+    span = (start, start + timedelta(minutes=minutes))
+    if venue_id in owners['venue']:
+      intervals[('venue', venue_id)].append(span)
+    if artist_id in owners['artist']:
+      intervals[('artist', artist_id)].append(span)
+  return {key: Timeline(owned) for key, owned in intervals.items()}
+
+
+def split_overlaps(rows):
+  """Split new show rows into those that can be booked and (row, side) pairs that can't.
+
+  A row can't be booked if it overlaps a stored show of its venue or artist,
+  or a row before it. On SQLite call with timelines.lock held, and pass the
+  rows written to remember_shows() once committed.
+  """
+  if not rows:
+    return [], []
+  spans = [(row['start_date'],
+            row['start_date'] + timedelta(minutes=row.get('duration') or SHOW_MINUTES))
+           for row in rows]
+  if db.engine.dialect.name == 'postgresql':
+    stored = _existing(rows, spans)
+    empty = Timeline()
+    def booked(side, owner_id):
+      return stored.get((side, owner_id), empty)
+  else:
+    booked = timelines.get
+  batch = defaultdict(Timeline)
+  accepted = list()
+  refused = list()
+  for row, (start, end) in zip(rows, spans):
+    owners = [(side, row[column.key]) for side, column in SIDES.items()]
+    busy = [side for side, owner_id in owners
+            if booked(side, owner_id).overlaps(start, end)
+            or ((side, owner_id) in batch and batch[(side, owner_id)].overlaps(start, end))]
+    if busy:
+      refused.append((row, busy[0]))
+      continue
+    for key in owners:
+      batch[key].add(start, end)
+    accepted.append(row)
+  return accepted, refused
+
+
+def remember_shows(rows):
+  # add committed rows accepted by split_overlaps() to the loaded timelines (SQLite)
+  if db.engine.dialect.name == 'postgresql':
+    return
+  with timelines.lock:
+    for row in rows:
+      start = row['start_date']
+      end = start + timedelta(minutes=row.get('duration') or SHOW_MINUTES)
+      for side, column in SIDES.items():
+        timelines.get(side, row[column.key]).add(start, end)
+
+
+def forget_shows(shows):
+  # call with the shows of a deleted venue or artist, before they are gone
+  shows = list(shows)
+  for side, column in SIDES.items():
+    timelines.forget(side, {getattr(show, column.key) for show in shows})
+
+
+def book_show(artist_id, venue_id, start_date, duration=SHOW_MINUTES, now=None):
+  """Insert and commit a show, or raise BookingConflict if either side is busy."""
+  show = Show(artist_id=artist_id, venue_id=venue_id, start_date=start_date,
+              duration=duration)
+  if db.engine.dialect.name == 'postgresql':
+    side = _booked_side(show)
+    if side is not None:
+      raise BookingConflict(side)
+    try:
+      db.session.add(show)
+      # INSERT now: record_show()'s UPDATEs would autoflush it, and a concurrent
+      # booking that won the race must surface here as a constraint violation
+      db.session.flush()
+      record_show(show, now)
+      db.session.commit()
+    except IntegrityError as error:
+      db.session.rollback()
+      side = conflict_side(error)
+      if side is None:
+        raise
+      raise BookingConflict(side)
+    return show
+
+  end_date = show.end_date
+  with timelines.lock:
+    booked = {side: timelines.get(side, owner_id)
+              for side, owner_id in (('venue', venue_id), ('artist', artist_id))}
+    for side, timeline in booked.items():
+      if timeline.overlaps(start_date, end_date):
+        raise BookingConflict(side)
+    db.session.add(show)
+    record_show(show, now)
+    db.session.commit()
+    for timeline in booked.values():
+      timeline.add(start_date, end_date)
+  return show
@@ -0,0 +1,131 @@
+#----------------------------------------------------------------------------#
+# Page cache.
+#
+# Rendered GET pages are kept in an in-process LRU with a TTL. Each cache key
+# carries the current version of every entity type the page is built from
+# ('venue', 'artist', 'show'); write handlers bump those versions after they
+# commit, so a page rendered before a write is never served after it.
+# Versions live in this process only: with several workers, a write in one
+# worker reaches the others' caches when their entries expire (PAGE_CACHE_TTL).
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from flask import request, session, make_response, Response
+
+
+class PageCache(object):
+
+  def __init__(self, max_entries=256, ttl=300):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self._entries = OrderedDict()
+    self._versions = defaultdict(int)
+    self._lock = threading.Lock()
+    self.clear()
+
+  def init_app(self, app):
+    self.max_entries = app.config.get('PAGE_CACHE_SIZE', self.max_entries)
+    self.ttl = app.config.get('PAGE_CACHE_TTL', self.ttl)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self.hits = 0
+      self.misses = 0
+      self.hit_seconds = 0.0
+      self.miss_seconds = 0.0
+
+  def versions(self, entities):
+    with self._lock:
+      return tuple(self._versions[entity] for entity in entities)
+
+  def bump(self, *entities):
+    with self._lock:
+      for entity in entities:
+        self._versions[entity] += 1
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      expires, page = entry
+      if expires < time.monotonic():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return page
+
+  def set(self, key, page):
+    with self._lock:
+      self._entries[key] = (time.monotonic() + self.ttl, page)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def record(self, hit, started):
+    elapsed = time.perf_counter() - started
+    with self._lock:
+      if hit:
+        self.hits += 1
+        self.hit_seconds += elapsed
+      else:
+        self.misses += 1
+        self.miss_seconds += elapsed
+
+  def stats(self):
+    with self._lock:
+      lookups = self.hits + self.misses
+      return {
+        "entries": len(self._entries),
+        "max_entries": self.max_entries,
+        "ttl": self.ttl,
+        "hits": self.hits,
+        "misses": self.misses,
+        "hit_rate": self.hits / lookups if lookups else 0.0,
+        "avg_hit_ms": 1000 * self.hit_seconds / self.hits if self.hits else 0.0,
+        "avg_miss_ms": 1000 * self.miss_seconds / self.misses if self.misses else 0.0,
+        "versions": dict(self._versions)
+      }
+
+  def _tee(self, key, chunks, started):
+    # pass a streamed page through, keeping it only if it streams out completely
+    parts = list()
+    for chunk in chunks:
+      parts.append(chunk)
+      yield chunk
+    self.set(key, b''.join(parts))
+    self.record(False, started)
+
+
+page_cache = PageCache()
+
+
+def cached_page(*entities):
+  # cache a GET view's rendered page until one of the given entity types changes
+  def decorator(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      # pages render pending flash messages, which must not end up in the cache
+      if request.method != 'GET' or session.get('_flashes'):
+        return view(*args, **kwargs)
+      started = time.perf_counter()
+      key = (request.full_path, entities, page_cache.versions(entities))
+      page = page_cache.get(key)
+      if page is not None:
+        page_cache.record(True, started)
+        return Response(page, mimetype='text/html')
+      response = make_response(view(*args, **kwargs))
+      if response.status_code != 200:
+        return response
+      if response.is_streamed:
+        response.response = page_cache._tee(key, response.iter_encoded(), started)
+      else:
+        page_cache.set(key, response.get_data())
+        page_cache.record(False, started)
+      return response
+    return wrapper
+  return decorator
@@ -0,0 +1,83 @@
+#----------------------------------------------------------------------------#
+# Show counters.
+#
+# Venue and Artist carry denormalized upcoming/past show counts so listing
+# and search pages can read them per row instead of counting Shows.
+# Bookings bump them in place; reconcile_show_counts() rolls shows that have
+# started over to "past" and repairs any drift, in the venue directory and
+# the genre facet counts too. Run it periodically, e.g.
+# from cron:  flask reconcile-show-counts
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, or_, select
+from cache import page_cache
+from models import db, Venue, Artist, Show
+from directory import refresh_venues, sync_directory
+from facets import sync_genre_counts
+
+
+def record_show(show, now=None):
+  # count a newly booked show against its venue and artist, in the caller's transaction
+  if now is None:
+    now = datetime.now()
+  upcoming = show.start_date > now
+  for model, owner_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+    column = model.upcoming_shows_count if upcoming else model.past_shows_count
+    model.query.filter(model.id == owner_id).update(
+      {column: column + 1, model.updated_at: model.updated_at}, synchronize_session=False)
+  if upcoming:
+    refresh_venues([show.venue_id])
+
+
+def _recount(model, foreign_key, ids=None, now=None):
+  # only rows whose counts are off are written, so a run that changes
+  # nothing neither rewrites nor locks them
+  if now is None:
+    now = datetime.now()
+  shows = select(func.count(Show.id)).where(foreign_key == model.id)
+  upcoming = shows.where(Show.start_date > now).scalar_subquery()
+  past = shows.where(Show.start_date <= now).scalar_subquery()
+  query = model.query.filter(or_(
+    model.upcoming_shows_count.is_distinct_from(upcoming),
+    model.past_shows_count.is_distinct_from(past)))
+  if ids is not None:
+    if not ids:
+      return 0
+    query = query.filter(model.id.in_(ids))
+  return query.update({
+    model.upcoming_shows_count: upcoming,
+    model.past_shows_count: past,
+    # counters are not part of what the API serves; keep its ETags
+    model.updated_at: model.updated_at
+  }, synchronize_session=False)
+
+
+def release_venue(venue):
+  # call after session.delete(venue): the cascaded shows leave their artists' counts
+  artist_ids = {show.artist_id for show in venue.shows}
+  db.session.flush()
+  _recount(Artist, Show.artist_id, artist_ids)
+
+
+def reconcile_show_counts(now=None):
+  # recompute every counter from Shows; returns the number of rows corrected
+  if now is None:
+    now = datetime.now()
+  touched = _recount(Venue, Show.venue_id, now=now)
+  touched += _recount(Artist, Show.artist_id, now=now)
+  sync_directory()
+  sync_genre_counts()
+  db.session.commit()
+  page_cache.bump('show')
+  return touched
+
+
+@click.command('reconcile-show-counts')
+@with_appcontext
+def reconcile_show_counts_command():
+  """Roll started shows to past and repair venue/artist show counters."""
+  touched = reconcile_show_counts()
+  click.echo('Reconciled show counts on {} rows.'.format(touched))
@@ -0,0 +1,108 @@
+#----------------------------------------------------------------------------#
+# Venue directory.
+#
+# /venues lists every city with its venues and their upcoming show counts.
+# Rather than group all venues on each request, the structure is kept in the
+# VenueDirectory table, one row per (city, state), and read back in primary
+# key order. Whatever changes a venue's city, name or upcoming count
+# refreshes the affected rows in the same transaction:
+#   * the venue create, edit and delete handlers,
+#   * record_show() in counters.py,
+#   * reconcile_show_counts(), which refreshes the rows it left stale.
+# Venues without a city or state are not listed.
+# On Postgres a refresh first takes a transaction advisory lock per area, so
+# concurrent writes to the same city queue up and each one rebuilds the row
+# from the venues the one before it committed.
+#
+# Check it against the live tables with:  flask check-venue-directory
+#----------------------------------------------------------------------------#
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, tuple_
+from models import db, Venue, Area
+from listings import venue_areas
+
+
+def read_directory():
+  # what listings.venue_areas() returns, in one primary key scan
+  return [{
+    "city": city,
+    "state": state,
+    "venues": venues
+  } for city, state, venues in db.session.query(
+    Area.city, Area.state, Area.venues).order_by(Area.city, Area.state)]
+
+
+def _live(areas=None):
+  return {(area['city'], area['state']): area['venues'] for area in venue_areas(areas=areas)
+          if area['city'] is not None and area['state'] is not None}
+
+
+def area_lock(city, state):
+  # SELECT taking the Postgres advisory lock of one area until commit
+  return select(func.pg_advisory_xact_lock(
+    func.hashtext('{}/{}/{}'.format(Area.__tablename__, city, state))))
+
+
+def _lock_areas(areas):
+  # taken in one order so two refreshes can't deadlock
+  if db.engine.dialect.name != 'postgresql':
+    return
+  for city, state in sorted(areas):
+    db.session.execute(area_lock(city, state))
+
+
+def refresh_areas(areas):
+  """Rebuild the directory rows of the given (city, state) pairs."""
+  areas = {(city, state) for city, state in areas if city is not None and state is not None}
+  if not areas:
+    return 0
+  _lock_areas(areas)
+  # read after the lock: under read committed this statement sees the venues
+  # of a refresh that held it
+  live = _live(areas)
+  Area.query.filter(tuple_(Area.city, Area.state).in_(list(areas))).delete(
+    synchronize_session=False)
+  db.session.bulk_insert_mappings(Area, [
+    {'city': city, 'state': state, 'venues': venues} for (city, state), venues in live.items()])
+  return len(areas)
+
+
+def refresh_venues(venue_ids):
+  # refresh the areas the given venues are listed in
+  if not venue_ids:
+    return 0
+  return refresh_areas(db.session.query(Venue.city, Venue.state).filter(
+    Venue.id.in_(list(venue_ids))).distinct())
+
+
+def stale_areas():
+  """(city, state) pairs whose directory row differs from the live tables."""
+  live = _live()
+  stored = {(city, state): venues
+            for city, state, venues in db.session.query(Area.city, Area.state, Area.venues)}
+  return {area for area in live.keys() | stored.keys() if live.get(area) != stored.get(area)}
+
+
+def sync_directory():
+  # refresh whatever is stale; returns the number of areas rewritten
+  return refresh_areas(stale_areas())
+
+
+@click.command('check-venue-directory')
+@click.option('--repair', is_flag=True, help='Rewrite the stale rows.')
+@with_appcontext
+def check_venue_directory_command(repair):
+  """Compare the /venues directory with the Venue table."""
+  stale = sorted(stale_areas())
+  for city, state in stale:
+    click.echo('stale: {}, {}'.format(city, state))
+  if stale and repair:
+    refresh_areas(stale)
+    db.session.commit()
+    click.echo('Repaired {} areas.'.format(len(stale)))
+  elif stale:
+    raise click.ClickException('{} stale areas.'.format(len(stale)))
+  else:
+    click.echo('The venue directory is consistent.')
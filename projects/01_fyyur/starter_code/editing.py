@@ -0,0 +1,93 @@
+#----------------------------------------------------------------------------#
+# Edits.
+#
+# Saving a venue or artist edit form reads the row's current values as plain
+# columns (no ORM object), compares them with the submission and issues one
+#   UPDATE ... SET <changed columns>, version = version + 1
+#   WHERE id = :id AND version = :version
+# Nothing is written when nothing changed. The edit form carries the version
+# it was filled from; if the row has moved on since, because someone else
+# saved in between, EditConflict is raised instead of overwriting their
+# changes. A submission without a valid version can't show it was filled
+# from the current row and raises OutdatedForm, an EditConflict nobody else
+# caused. No row lock is held while the user edits.
+#----------------------------------------------------------------------------#
+
+from models import db, Venue, Artist
+
+# model -> {form field: column}
+FIELDS = {
+  Venue: {
+    'name': 'name', 'city': 'city', 'state': 'state', 'address': 'address',
+    'phone': 'phone', 'genres': 'genres', 'image_link': 'image_link',
+    'facebook_link': 'facebook_link', 'website_link': 'website_link',
+    'seeking_talent': 'seeking_talent', 'seeking_description': 'talent_description'
+  },
+  Artist: {
+    'name': 'name', 'city': 'city', 'state': 'state', 'phone': 'phone',
+    'genres': 'genres', 'image_link': 'image_link',
+    'facebook_link': 'facebook_link', 'website_link': 'website_link',
+    'seeking_venue': 'seeking_venues', 'seeking_description': 'venue_description'
+  },
+}
+
+# unticked checkboxes and empty multi-selects are left out of a submission
+CHECKBOXES = ('seeking_talent', 'seeking_venue')
+LISTS = ('genres',)
+
+
+class EditConflict(Exception):
+  """The row was saved by someone else since the form was filled."""
+
+
+class OutdatedForm(EditConflict):
+  """The submission carries no valid version, e.g. from an old form."""
+
+
+def form_data(model, row):
+  # {form field: value} to fill an edit form from `row`, version included
+  data = {field: getattr(row, column) for field, column in FIELDS[model].items()}
+  data['version'] = row.version
+  return data
+
+
+def form_values(model, form):
+  # {column: value} submitted by an edit form
+  values = dict()
+  for field, column in FIELDS[model].items():
+    if field in CHECKBOXES:
+      values[column] = field in form
+    elif field in LISTS:
+      values[column] = form.getlist(field)
+    elif field in form:
+      values[column] = form[field]
+  return values
+
+
+def save_edits(model, id, form):
+  """Write the changed columns of an edit submission, in the caller's transaction.
+
+  Returns (current, changed): the row's values before the edit and the
+  columns that were updated, or (None, None) if there is no such row.
+  """
+  values = form_values(model, form)
+  columns = ['version'] + list(values)
+  row = db.session.query(*[getattr(model, column) for column in columns]).filter(
+    model.id == id).first()
+  if row is None:
+    return None, None
+  current = dict(zip(columns, row))
+  version = form.get('version', type=int)
+  if version is None:
+    raise OutdatedForm()
+  if version != current['version']:
+    raise EditConflict()
+
+  changed = {column: value for column, value in values.items() if current[column] != value}
+  if changed:
+    updated = model.query.filter(model.id == id, model.version == version).update(
+      dict(changed, version=model.version + 1), synchronize_session=False)
+    if not updated:
+      # saved by someone else between our read and our write
+      raise EditConflict()
+  return current, changed
@@ -0,0 +1,128 @@
+#----------------------------------------------------------------------------#
+# Genre facets.
+#
+# /venues and /artists can be narrowed to genres, matching any or all of the
+# selected ones. On Postgres both filters are array operators (&&, @>)
+# served by the GIN indexes on genres; on SQLite, where genres is JSON, they
+# go through json_each. Facet counts for a selection come from a single
+# aggregate query over the unnested genres. With no selection -- every
+# uncached /venues and /artists request -- they are read from the small
+# GenreCount table instead, which the create, edit and delete handlers adjust
+# by one per genre added or removed (count_genres); bulk loads and
+# reconcile_show_counts() rewrite whatever drifted (sync_genre_counts).
+#----------------------------------------------------------------------------#
+
+from sqlalchemy import func, select, exists, distinct, true
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Venue, Artist, GenreCount
+from search import genre_names
+
+MATCHES = ('any', 'all')
+
+
+def parse_selection(args):
+  # (genres, match) from a query string like ?genre=Jazz&genre=Blues&match=all;
+  # unknown genres are dropped, names are matched case-insensitively
+  genres = list()
+  for value in args.getlist('genre'):
+    genre = genre_names().get(value.strip().lower())
+    if genre is not None and genre not in genres:
+      genres.append(genre)
+  match = args.get('match', 'any')
+  return genres, match if match in MATCHES else 'any'
+
+
+def _each(model):
+  return func.json_each(model.genres).table_valued('value')
+
+
+def genre_filter(model, genres, match='any'):
+  # SQL condition for rows having any (or all) of the given genres
+  if db.engine.dialect.name != 'sqlite':
+    if match == 'all':
+      return model.genres.contains(genres)
+    return model.genres.overlap(genres)
+  each = _each(model)
+  if match == 'all':
+    found = select(func.count(distinct(each.c.value))).where(
+      each.c.value.in_(genres)).scalar_subquery()
+    return found == len(set(genres))
+  return exists(select(each.c.value).where(each.c.value.in_(genres)))
+
+
+def _genre_rows(model):
+  # one row per (row of model, genre)
+  if db.engine.dialect.name != 'sqlite':
+    return select(func.unnest(model.genres).label('genre'))
+  each = _each(model)
+  return select(each.c.value.label('genre')).select_from(model.__table__).join(each, true())
+
+
+def _upsert(rows, count):
+  # INSERT the GenreCount rows, setting `count` where they exist
+  insert = (sqlite if db.engine.dialect.name == 'sqlite' else postgresql).insert(GenreCount)
+  statement = insert.values(rows)
+  db.session.execute(statement.on_conflict_do_update(
+    index_elements=[GenreCount.kind, GenreCount.genre],
+    set_={'count': count(statement.excluded)}))
+
+
+def count_genres(model, added=(), removed=()):
+  """Adjust the facet counts of a row whose genres changed, in the caller's transaction."""
+  added, removed = set(added or ()), set(removed or ())
+  added, removed = added - removed, removed - added
+  kind = model.__tablename__
+  if added:
+    _upsert([{'kind': kind, 'genre': genre, 'count': 1} for genre in sorted(added)],
+            lambda excluded: GenreCount.count + excluded.count)
+  if removed:
+    GenreCount.query.filter(GenreCount.kind == kind, GenreCount.genre.in_(removed)).update(
+      {GenreCount.count: GenreCount.count - 1}, synchronize_session=False)
+
+
+def sync_genre_counts(models=(Venue, Artist)):
+  # rewrite the facet counts that differ from the live tables; returns how many
+  fixed = 0
+  for model in models:
+    kind = model.__tablename__
+    rows = _genre_rows(model).subquery()
+    live = {genre: count for genre, count in db.session.query(
+      rows.c.genre, func.count()).group_by(rows.c.genre) if genre is not None}
+    stored = dict(db.session.query(GenreCount.genre, GenreCount.count).filter(
+      GenreCount.kind == kind))
+    changed = [{'kind': kind, 'genre': genre, 'count': count}
+               for genre, count in live.items() if stored.get(genre) != count]
+    gone = [genre for genre, count in stored.items() if genre not in live and count]
+    if changed:
+      _upsert(changed, lambda excluded: excluded.count)
+    if gone:
+      GenreCount.query.filter(GenreCount.kind == kind, GenreCount.genre.in_(gone)).update(
+        {GenreCount.count: 0}, synchronize_session=False)
+    fixed += len(changed) + len(gone)
+  return fixed
+
+
+def genre_facets(model, genres=(), match='any'):
+  # [{"genre", "count", "selected", "toggle"}] for the rows matching the selection
+  if genres:
+    rows = _genre_rows(model).where(genre_filter(model, genres, match)).subquery()
+    counts = db.session.query(rows.c.genre, func.count()
+      ).group_by(rows.c.genre
+      ).order_by(func.count().desc(), rows.c.genre
+      ).all()
+  else:
+    counts = db.session.query(GenreCount.genre, GenreCount.count
+      ).filter(GenreCount.kind == model.__tablename__, GenreCount.count > 0
+      ).order_by(GenreCount.count.desc(), GenreCount.genre
+      ).all()
+  facets = list()
+  for genre, count in counts:
+    selected = genre in genres
+    facets.append({
+      "genre": genre,
+      "count": count,
+      "selected": selected,
+      # the selection after clicking this facet
+      "toggle": [g for g in genres if g != genre] if selected else list(genres) + [genre]
+    })
+  return facets
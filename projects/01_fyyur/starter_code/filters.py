@@ -0,0 +1,51 @@
+#----------------------------------------------------------------------------#
+# Template filters.
+#
+# format_datetime is called once per show rendered, so the babel pattern and
+# locale are compiled once per (format, locale) and recently formatted values
+# are remembered instead of being formatted again on every page render.
+# babel and dateutil load on first use rather than when the app starts.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from functools import lru_cache
+
+FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def _compiled(format, locale):
+  import babel.dates
+  from babel import Locale
+  return babel.dates.parse_pattern(FORMATS.get(format, format)), Locale.parse(locale)
+
+
+@lru_cache(maxsize=4096)
+def _format(value, format, locale):
+  import babel.dates
+  pattern, locale = _compiled(format, locale)
+  # babel treats naive datetimes as UTC
+  if value.tzinfo is None:
+    value = value.replace(tzinfo=babel.dates.UTC)
+  return pattern.apply(value, locale)
+
+
+def format_datetime(value, format='medium', locale='en'):
+  if not isinstance(value, datetime):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  return _format(value, format, locale)
+
+
+def format_datetimes(values, format='medium', locale='en'):
+  # formats a whole list of start times, each distinct value once
+  formatted = dict()
+  result = list()
+  for value in values:
+    if value not in formatted:
+      formatted[value] = format_datetime(value, format, locale)
+    result.append(formatted[value])
+  return result
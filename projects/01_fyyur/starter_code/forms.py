@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL , Regexp
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField, HiddenField
+from wtforms.validators import DataRequired, AnyOf, URL , Regexp, NumberRange
 import re
 class ShowForm(Form):
     artist_id = StringField(
@@ -15,6 +15,11 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration = IntegerField(
+        'duration',
+        validators=[NumberRange(min=1, max=24 * 60)],
+        default=120
+    )
         
 class VenueForm(Form):
     name = StringField(
@@ -126,6 +131,9 @@ class VenueForm(Form):
         'seeking_description'
     )
 
+    # the row version the edit form was filled from
+    version = HiddenField( 'version' )
+
 
 
 
@@ -237,4 +245,6 @@ class ArtistForm(Form):
             'seeking_description'
      )
 
+    version = HiddenField( 'version' )
+
 
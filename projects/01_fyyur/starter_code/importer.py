@@ -0,0 +1,237 @@
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+#   flask import-data venues venues.csv
+#   flask import-data shows shows.jsonl --batch-size 5000
+#
+# Rows are streamed from CSV (header row, genres separated by ';') or JSON
+# lines, validated with the same form classes the create pages use, and
+# written a batch at a time: COPY on Postgres, executemany elsewhere. After
+# each committed batch the number of input rows consumed is saved to a
+# checkpoint file next to the input, so an interrupted import picks up where
+# it stopped when run again. Remove the checkpoint (or pass --restart) to
+# import the file from the top.
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+import os
+import time
+import click
+from flask.cli import with_appcontext
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+from models import db, Venue, Artist, Show
+from counters import reconcile_show_counts
+from directory import sync_directory
+from facets import sync_genre_counts
+from editing import FIELDS
+from booking import conflict_side, remember_shows, split_overlaps, timelines
+from cache import page_cache
+from typeahead import typeahead
+
+BATCH_SIZE = 1000
+# times a show batch is checked again after a concurrent booking beat its COPY
+BOOKING_ATTEMPTS = 3
+
+# kind -> (model, form class name in forms.py, {form field: column})
+KINDS = {
+  'venues': (Venue, 'VenueForm', FIELDS[Venue]),
+  'artists': (Artist, 'ArtistForm', FIELDS[Artist]),
+  'shows': (Show, 'ShowForm', {
+    'artist_id': 'artist_id', 'venue_id': 'venue_id', 'start_time': 'start_date',
+    'duration': 'duration'
+  }),
+}
+
+
+def read_rows(path):
+  # yields one dict per input row, genres as a list
+  with open(path, newline='') as source:
+    if path.endswith('.jsonl') or path.endswith('.json'):
+      for line in source:
+        if line.strip():
+          yield json.loads(line)
+    else:
+      for row in csv.DictReader(source):
+        if row.get('genres'):
+          row['genres'] = [genre.strip() for genre in row['genres'].split(';')]
+        yield row
+
+
+def validate(form_class, fields, row):
+  # returns (column values, None) or (None, form errors)
+  formdata = MultiDict()
+  for key, value in row.items():
+    if value is None or value is False:
+      continue
+    if isinstance(value, list):
+      for item in value:
+        formdata.add(key, item)
+    else:
+      formdata.add(key, 'y' if value is True else str(value))
+  form = form_class(formdata=formdata, meta={'csrf': False})
+  if not form.validate():
+    return None, form.errors
+  return {column: form[field].data for field, column in fields.items()}, None
+
+
+def _copy_value(value):
+  if value is None:
+    return None
+  if isinstance(value, list):
+    return '{' + ','.join('"{}"'.format(item.replace('\\', '\\\\').replace('"', '\\"'))
+                          for item in value) + '}'
+  return value
+
+
+def write_batch(model, columns, rows):
+  table = model.__table__
+  if db.engine.dialect.name != 'postgresql':
+    db.session.execute(table.insert(), rows)
+    return
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  for row in rows:
+    writer.writerow([_copy_value(row[column]) for column in columns])
+  buffer.seek(0)
+  cursor = db.session.connection().connection.cursor()
+  cursor.copy_expert('COPY "{}" ({}) FROM STDIN WITH CSV'.format(
+    table.name, ', '.join(columns)), buffer)
+
+
+def _split_references(rows):
+  # splits show rows on whether their artist and venue exist, one query each
+  artist_ids = {row['artist_id'] for row in rows}
+  venue_ids = {row['venue_id'] for row in rows}
+  artists = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+  venues = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+  known = list()
+  missing = list()
+  for row in rows:
+    if row['artist_id'] in artists and row['venue_id'] in venues:
+      known.append(row)
+    else:
+      missing.append(row)
+  return known, missing
+
+
+def _write_shows(columns, rows):
+  # writes and commits the rows that overlap no show; returns the (row, side) pairs that do
+  for attempt in range(1, BOOKING_ATTEMPTS + 1):
+    with timelines.lock:
+      booked, overlapping = split_overlaps(rows)
+      try:
+        if booked:
+          write_batch(Show, columns, booked)
+        db.session.commit()
+      except (IntegrityError, db.engine.dialect.dbapi.IntegrityError) as error:
+        db.session.rollback()
+        if attempt == BOOKING_ATTEMPTS or conflict_side(error) is None:
+          raise
+        continue
+    remember_shows(booked)
+    return booked, overlapping
+
+
+def _load_checkpoint(path):
+  if not os.path.exists(path):
+    return 0
+  with open(path) as checkpoint:
+    return json.load(checkpoint)['rows']
+
+
+def _save_checkpoint(path, rows):
+  with open(path + '.tmp', 'w') as checkpoint:
+    json.dump({'rows': rows}, checkpoint)
+  os.replace(path + '.tmp', path)
+
+
+def import_rows(kind, rows, batch_size=BATCH_SIZE, checkpoint=None, report=click.echo):
+  # imports an iterable of row dicts; returns (imported, rejected)
+  import forms
+  model, form_name, fields = KINDS[kind]
+  form_class = getattr(forms, form_name)
+  columns = list(fields.values())
+  done = _load_checkpoint(checkpoint) if checkpoint else 0
+  imported = rejected = 0
+  batch = list()
+  position = flushed = done
+
+  def flush(batch, position):
+    nonlocal imported, rejected, flushed
+    started = time.perf_counter()
+    if kind == 'shows':
+      batch, missing = _split_references(batch)
+      for row in missing:
+        report('rejected {}: unknown artist or venue'.format(row), err=True)
+      rejected += len(missing)
+      batch, overlapping = _write_shows(columns, batch)
+      for row, side in overlapping:
+        report('rejected {}: the {} is already booked at that time'.format(row, side), err=True)
+      rejected += len(overlapping)
+    else:
+      if batch:
+        write_batch(model, columns, batch)
+      db.session.commit()
+    if checkpoint:
+      _save_checkpoint(checkpoint, position)
+    imported += len(batch)
+    flushed = position
+    elapsed = time.perf_counter() - started
+    report('rows {}: {} imported in {:.2f}s ({:.0f} rows/s)'.format(
+      position, len(batch), elapsed, len(batch) / elapsed if elapsed else 0))
+
+  for position, row in enumerate(rows, 1):
+    if position <= done:
+      continue
+    values, errors = validate(form_class, fields, row)
+    if kind == 'shows' and values is not None:
+      try:
+        values['artist_id'] = int(values['artist_id'])
+        values['venue_id'] = int(values['venue_id'])
+      except (TypeError, ValueError):
+        values, errors = None, {'artist_id': ['Not a valid id.']}
+    if errors:
+      rejected += 1
+      report('rejected row {}: {}'.format(position, errors), err=True)
+      continue
+    batch.append(values)
+    if len(batch) >= batch_size:
+      flush(batch, position)
+      batch = list()
+  if position > flushed:
+    flush(batch, position)
+
+  if kind == 'shows':
+    reconcile_show_counts()
+    timelines.clear()
+  else:
+    if kind == 'venues':
+      sync_directory()
+    sync_genre_counts([model])
+    db.session.commit()
+    typeahead.clear()
+    page_cache.bump(model.__name__.lower())
+  return imported, rejected
+
+
+@click.command('import-data')
+@click.argument('kind', type=click.Choice(sorted(KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=BATCH_SIZE, show_default=True)
+@click.option('--checkpoint', default=None,
+              help='Checkpoint file; defaults to PATH.checkpoint.')
+@click.option('--restart', is_flag=True, help='Ignore an existing checkpoint.')
+@with_appcontext
+def import_data_command(kind, path, batch_size, checkpoint, restart):
+  """Bulk import venues, artists or shows from CSV or JSON lines."""
+  checkpoint = checkpoint or path + '.checkpoint'
+  if restart and os.path.exists(checkpoint):
+    os.remove(checkpoint)
+  started = time.perf_counter()
+  imported, rejected = import_rows(kind, read_rows(path), batch_size, checkpoint)
+  elapsed = time.perf_counter() - started
+  click.echo('Imported {} {} ({} rejected) in {:.1f}s.'.format(
+    imported, kind, rejected, elapsed))
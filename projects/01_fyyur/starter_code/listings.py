@@ -0,0 +1,191 @@
+#----------------------------------------------------------------------------#
+# Listings.
+#
+# Builds the data handed to the listing and detail templates from a fixed
+# number of queries, so round trips do not depend on catalog size.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from itertools import groupby
+from sqlalchemy import tuple_
+from models import db, Venue, Artist, Show
+from facets import genre_filter
+
+SHOWS_PER_PAGE = 100
+ARTISTS_PER_PAGE = 100
+MAX_PER_PAGE = 500
+# rows fetched per round trip while a page streams out
+STREAM_BATCH = 50
+
+
+class KeysetPage(object):
+  # one page of a keyset-ordered query. Rows are fetched lazily so a streamed
+  # template renders them as they arrive; next_cursor is set once the page
+  # has been iterated and there are more rows after it.
+
+  def __init__(self, query, limit, format_row, cursor_of):
+    self.query = query
+    self.limit = max(1, min(limit, MAX_PER_PAGE))
+    self.format_row = format_row
+    self.cursor_of = cursor_of
+    self.next_cursor = None
+
+  def __iter__(self):
+    last = None
+    rows = self.query.limit(self.limit + 1).yield_per(STREAM_BATCH)
+    for count, row in enumerate(rows):
+      if count < self.limit:
+        last = row
+        yield self.format_row(row)
+      else:
+        self.next_cursor = self.cursor_of(last)
+
+
+def parse_show_cursor(value):
+  # "<start_date isoformat>_<id>" -> (datetime, int); raises ValueError
+  if not value:
+    return None
+  start_date, show_id = value.rsplit('_', 1)
+  return datetime.fromisoformat(start_date), int(show_id)
+
+
+def shows_page(after=None, limit=SHOWS_PER_PAGE):
+  # shows ordered by (start_date, id), starting after the given cursor
+  query = db.session.query(
+      Show.id, Show.start_date, Show.venue_id, Venue.name,
+      Show.artist_id, Artist.name, Artist.image_link
+    ).join(Venue, Show.venue_id == Venue.id
+    ).join(Artist, Show.artist_id == Artist.id
+    ).order_by(Show.start_date, Show.id)
+  if after is not None:
+    query = query.filter(tuple_(Show.start_date, Show.id) > tuple_(*after))
+  return KeysetPage(query, limit, lambda row: {
+      "venue_id": row[2],
+      "venue_name": row[3],
+      "artist_id": row[4],
+      "artist_name": row[5],
+      "artist_image_link": row[6],
+      "start_time": row[1]
+    }, lambda row: '{}_{}'.format(row[1].isoformat(), row[0]))
+
+
+def artists_page(after=None, limit=ARTISTS_PER_PAGE, genres=(), match='any'):
+  # artists ordered by id, starting after the given id, optionally of some genres
+  query = db.session.query(Artist.id, Artist.name).order_by(Artist.id)
+  if after is not None:
+    query = query.filter(Artist.id > after)
+  if genres:
+    query = query.filter(genre_filter(Artist, genres, match))
+  return KeysetPage(query, limit, lambda row: {
+      "id": row[0],
+      "name": row[1]
+    }, lambda row: row[0])
+
+
+def venue_areas(genres=(), match='any', areas=None):
+  # city -> venues -> upcoming show count, read off the maintained counters;
+  # `areas` limits it to some (city, state) pairs. Unfiltered, /venues reads
+  # the same structure from the directory table instead (see directory.py).
+  query = db.session.query(
+      Venue.city, Venue.state, Venue.id, Venue.name, Venue.upcoming_shows_count
+    ).order_by(Venue.city, Venue.state, Venue.id)
+  if genres:
+    query = query.filter(genre_filter(Venue, genres, match))
+  if areas is not None:
+    query = query.filter(tuple_(Venue.city, Venue.state).in_(list(areas)))
+  rows = query.all()
+
+  areas = list()
+  for (city, state), venues in groupby(rows, key=lambda row: (row[0], row[1])):
+    areas.append({
+      "city": city,
+      "state": state,
+      "venues": [{
+        "id": venue_id,
+        "name": name,
+        "num_upcoming_shows": count
+      } for _, _, venue_id, name, count in venues]
+    })
+  return areas
+
+
+def _split_shows(rows, keys, now):
+  # one pass over shows ordered by start date: past first, then upcoming
+  past_shows = list()
+  upcoming_shows = list()
+  for row in rows:
+    show = dict(zip(keys, row))
+    if show["start_time"] > now:
+      upcoming_shows.append(show)
+    else:
+      past_shows.append(show)
+  return past_shows, upcoming_shows
+
+
+def venue_detail(venue_id, now=None):
+  # data for pages/show_venue.html, or None if there is no such venue
+  if now is None:
+    now = datetime.now()
+  venue = Venue.query.get(venue_id)
+  if venue is None:
+    return None
+  rows = db.session.query(
+      Show.artist_id, Artist.name, Artist.image_link, Show.start_date
+    ).join(Artist, Show.artist_id == Artist.id
+    ).filter(Show.venue_id == venue_id
+    ).order_by(Show.start_date, Show.id
+    ).all()
+  past_shows, upcoming_shows = _split_shows(
+    rows, ("artist_id", "artist_name", "artist_image_link", "start_time"), now)
+  return {
+    "id": venue.id,
+    "name": venue.name,
+    "genres": venue.genres,
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website_link,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.talent_description,
+    "image_link": venue.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows)
+  }
+
+
+def artist_detail(artist_id, now=None):
+  # data for pages/show_artist.html, or None if there is no such artist
+  if now is None:
+    now = datetime.now()
+  artist = Artist.query.get(artist_id)
+  if artist is None:
+    return None
+  rows = db.session.query(
+      Show.venue_id, Venue.name, Venue.image_link, Show.start_date
+    ).join(Venue, Show.venue_id == Venue.id
+    ).filter(Show.artist_id == artist_id
+    ).order_by(Show.start_date, Show.id
+    ).all()
+  past_shows, upcoming_shows = _split_shows(
+    rows, ("venue_id", "venue_name", "venue_image_link", "start_time"), now)
+  return {
+    "id": artist.id,
+    "name": artist.name,
+    "genres": artist.genres,
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website_link,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venues,
+    "seeking_description": artist.venue_description,
+    "image_link": artist.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows),
+  }
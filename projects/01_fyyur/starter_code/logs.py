@@ -0,0 +1,133 @@
+#----------------------------------------------------------------------------#
+# Logging.
+#
+# Request threads only put log records on a bounded queue; a background
+# QueueListener thread formats them as JSON lines and writes them to a
+# size-rotated file, so a slow disk or a burst of logging never blocks a
+# request. If the queue is full, records are dropped and counted (see
+# /metrics) rather than waited on. Each record carries the request id
+# (X-Request-ID, generated if the client sent none), method, route, path and
+# time since the request started (set up in metrics.py); one 'fyyur.access'
+# record is written per request.
+#----------------------------------------------------------------------------#
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from flask import g, request, has_request_context
+from flask.logging import default_handler
+
+access_log = logging.getLogger('fyyur.access')
+
+# attributes every LogRecord has; anything else was added as context
+_STANDARD = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+
+  def format(self, record):
+    entry = {
+      "time": self.formatTime(record),
+      "level": record.levelname,
+      "logger": record.name,
+      "message": record.getMessage(),
+    }
+    for key, value in vars(record).items():
+      if key not in _STANDARD:
+        entry[key] = value
+    if record.exc_info and not record.exc_text:
+      record.exc_text = self.formatException(record.exc_info)
+    if record.exc_text:
+      entry["exception"] = record.exc_text
+    return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+  # runs on the request thread, before the record is queued
+
+  def filter(self, record):
+    if has_request_context():
+      record.request_id = g.get('request_id')
+      record.method = request.method
+      record.route = request.url_rule.rule if request.url_rule else None
+      record.path = request.path
+      if 'request_started' in g:
+        record.elapsed_ms = round(1000 * (time.perf_counter() - g.request_started), 3)
+    return True
+
+
+_tracebacks = logging.Formatter()
+
+
+class DroppingQueueHandler(QueueHandler):
+
+  def __init__(self, log_queue):
+    super(DroppingQueueHandler, self).__init__(log_queue)
+    self.dropped = 0
+
+  def prepare(self, record):
+    # QueueHandler.prepare() folds the traceback into the message; keep it
+    # apart in exc_text, formatted here while exc_info is still live, so
+    # JsonFormatter writes it as "exception"
+    record = copy.copy(record)
+    if record.exc_info and not record.exc_text:
+      record.exc_text = _tracebacks.formatException(record.exc_info)
+    record.msg = record.getMessage()
+    record.args = None
+    record.exc_info = None
+    return record
+
+  def enqueue(self, record):
+    try:
+      self.queue.put_nowait(record)
+    except queue.Full:
+      self.dropped += 1
+
+
+def configure_logging(app, handler=None):
+  """Route app.logger and the fyyur.* loggers through a background writer.
+
+  handler defaults to a RotatingFileHandler on LOG_FILE; returns the
+  QueueListener, which is stopped (and drained) at exit.
+  """
+  if handler is None:
+    handler = RotatingFileHandler(app.config.get('LOG_FILE', 'error.log'),
+                                  maxBytes=app.config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+                                  backupCount=app.config.get('LOG_BACKUP_COUNT', 5))
+  handler.setFormatter(JsonFormatter())
+  log_queue = queue.Queue(app.config.get('LOG_QUEUE_SIZE', 10000))
+  queue_handler = DroppingQueueHandler(log_queue)
+  queue_handler.addFilter(RequestContextFilter())
+  # its dropped count is reported by /metrics
+  app.extensions['fyyur_logs'] = queue_handler
+  # Flask's default handler writes to stderr on the request thread
+  app.logger.removeHandler(default_handler)
+  for logger in (app.logger, logging.getLogger('fyyur')):
+    logger.setLevel(logging.INFO)
+    logger.addHandler(queue_handler)
+  listener = QueueListener(log_queue, handler, respect_handler_level=True)
+  listener.start()
+  atexit.register(listener.stop)
+
+  @app.before_request
+  def assign_request_id():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+  @app.after_request
+  def echo_request_id(response):
+    response.headers['X-Request-ID'] = g.request_id
+    return response
+
+  @app.teardown_request
+  def log_access(exc):
+    if 'request_id' in g:
+      # response_status is remembered by metrics.py
+      access_log.info('%s %s %s', request.method, request.full_path,
+                      500 if exc is not None else g.get('response_status'))
+
+  return listener
@@ -0,0 +1,147 @@
+#----------------------------------------------------------------------------#
+# Request metrics.
+#
+# Every request is timed and the SQL statements it runs are counted and
+# timed through engine events. Per-route aggregates are served at /metrics.
+# Requests slower than SLOW_REQUEST_MS, or running more than
+# SLOW_REQUEST_STATEMENTS statements (the signature of an N+1 loop), are
+# written to the 'fyyur.slow' logger together with their statements and
+# kept in a short list shown on /metrics.
+#----------------------------------------------------------------------------#
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from flask import g, request, has_app_context, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_log = logging.getLogger('fyyur.slow')
+
+# latencies kept per route for percentiles
+WINDOW = 1000
+SLOW_REQUESTS_KEPT = 50
+
+
+class RouteStats(object):
+
+  def __init__(self):
+    self.count = 0
+    self.errors = 0
+    self.total_ms = 0.0
+    self.max_ms = 0.0
+    self.statements = 0
+    self.max_statements = 0
+    self.sql_ms = 0.0
+    self.latencies = deque(maxlen=WINDOW)
+
+  def add(self, elapsed_ms, statements, sql_ms, status):
+    self.count += 1
+    self.errors += status >= 500
+    self.total_ms += elapsed_ms
+    self.max_ms = max(self.max_ms, elapsed_ms)
+    self.statements += statements
+    self.max_statements = max(self.max_statements, statements)
+    self.sql_ms += sql_ms
+    self.latencies.append(elapsed_ms)
+
+  def summary(self):
+    ordered = sorted(self.latencies)
+    def percentile(fraction):
+      return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+    return {
+      "count": self.count,
+      "errors": self.errors,
+      "avg_ms": self.total_ms / self.count,
+      "p50_ms": percentile(0.50),
+      "p95_ms": percentile(0.95),
+      "max_ms": self.max_ms,
+      "avg_statements": self.statements / self.count,
+      "max_statements": self.max_statements,
+      "avg_sql_ms": self.sql_ms / self.count,
+    }
+
+
+class RequestMetrics(object):
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.reset()
+
+  def reset(self):
+    with self._lock:
+      self.routes = defaultdict(RouteStats)
+      self.slow_requests = deque(maxlen=SLOW_REQUESTS_KEPT)
+
+  def record(self, route, elapsed_ms, statements, status):
+    sql_ms = sum(duration for _, duration in statements)
+    with self._lock:
+      self.routes[route].add(elapsed_ms, len(statements), sql_ms, status)
+    if (elapsed_ms > current_app.config.get('SLOW_REQUEST_MS', 500) or
+        len(statements) > current_app.config.get('SLOW_REQUEST_STATEMENTS', 20)):
+      slow = {
+        "route": route,
+        "path": request.full_path,
+        "status": status,
+        "elapsed_ms": elapsed_ms,
+        "sql_ms": sql_ms,
+        "statements": [{"sql": sql, "ms": duration} for sql, duration in statements],
+      }
+      with self._lock:
+        self.slow_requests.append(slow)
+      slow_log.warning('slow request %s %.1fms, %d statements (%.1fms SQL)\n%s',
+                       slow["path"], elapsed_ms, len(statements), sql_ms,
+                       '\n'.join('  {:.2f}ms {}'.format(duration, sql)
+                                 for sql, duration in statements))
+
+  def summary(self):
+    with self._lock:
+      return {
+        "routes": {route: stats.summary() for route, stats in self.routes.items()},
+        "slow_requests": list(self.slow_requests),
+      }
+
+
+request_metrics = RequestMetrics()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  # on the statement's own context: after_cursor_execute doesn't run if it raises
+  context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  elapsed_ms = 1000 * (time.perf_counter() - context._query_started)
+  if has_app_context() and 'sql_statements' in g:
+    g.sql_statements.append((statement, elapsed_ms))
+
+
+def start_request_timer():
+  g.request_started = time.perf_counter()
+  g.sql_statements = list()
+
+
+def remember_status(response):
+  g.response_status = response.status_code
+  return response
+
+
+def record_request(exc):
+  # runs once a streamed response has been sent too
+  if 'request_started' not in g:
+    return
+  elapsed_ms = 1000 * (time.perf_counter() - g.request_started)
+  route = '{} {}'.format(request.method, request.url_rule.rule if request.url_rule else '<unmatched>')
+  status = 500 if exc is not None else g.get('response_status', 500)
+  request_metrics.record(route, elapsed_ms, g.pop('sql_statements'), status)
+  g.pop('request_started')
+
+
+def configure_metrics(app):
+  # time every request of `app` and count its SQL statements
+  app.before_request(start_request_timer)
+  app.after_request(remember_status)
+  app.teardown_request(record_request)
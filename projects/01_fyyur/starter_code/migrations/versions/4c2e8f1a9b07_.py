@@ -0,0 +1,36 @@
+"""denormalized show counters on Venue and Artist
+
+Revision ID: 4c2e8f1a9b07
+Revises: 00b3513bb727
+Create Date: 2026-10-18 17:40:12.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c2e8f1a9b07'
+down_revision = '00b3513bb727'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        # backfill from the existing shows
+        op.execute(
+            'UPDATE "{table}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Shows" '
+            'WHERE "Shows".{key} = "{table}".id AND "Shows".start_date > now()), '
+            'past_shows_count = (SELECT count(*) FROM "Shows" '
+            'WHERE "Shows".{key} = "{table}".id AND "Shows".start_date <= now())'
+            .format(table=table, key=key))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,36 @@
+"""trigram and genre indexes for venue/artist search
+
+Revision ID: 9d31b6e5a2c4
+Revises: 4c2e8f1a9b07
+Create Date: 2026-10-18 18:05:47.306511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d31b6e5a2c4'
+down_revision = '4c2e8f1a9b07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        prefix = 'ix_{}'.format(table.lower())
+        op.create_index('{}_name_trgm'.format(prefix), table, ['name'],
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('{}_city_trgm'.format(prefix), table, ['city'],
+                        postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'})
+        op.create_index('{}_genres'.format(prefix), table, ['genres'],
+                        postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        prefix = 'ix_{}'.format(table.lower())
+        op.drop_index('{}_genres'.format(prefix), table_name=table)
+        op.drop_index('{}_city_trgm'.format(prefix), table_name=table)
+        op.drop_index('{}_name_trgm'.format(prefix), table_name=table)
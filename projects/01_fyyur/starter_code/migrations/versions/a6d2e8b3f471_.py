@@ -0,0 +1,26 @@
+"""version on Venue and Artist for optimistic edits
+
+Revision ID: a6d2e8b3f471
+Revises: f3a8c61d5e92
+Create Date: 2026-10-18 23:31:52.160937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2e8b3f471'
+down_revision = 'f3a8c61d5e92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'version')
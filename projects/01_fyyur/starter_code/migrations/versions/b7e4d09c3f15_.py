@@ -0,0 +1,36 @@
+"""indexes for the Shows and Venue access paths
+
+Revision ID: b7e4d09c3f15
+Revises: 9d31b6e5a2c4
+Create Date: 2026-10-18 19:12:30.552970
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e4d09c3f15'
+down_revision = '9d31b6e5a2c4'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_shows_venue_start_date', 'Shows', ['venue_id', 'start_date']),
+    ('ix_shows_artist_start_date', 'Shows', ['artist_id', 'start_date']),
+    ('ix_venue_city_state', 'Venue', ['city', 'state']),
+]
+
+
+def upgrade():
+    # CONCURRENTLY keeps the tables writable while the indexes build, but
+    # cannot run inside the migration's transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
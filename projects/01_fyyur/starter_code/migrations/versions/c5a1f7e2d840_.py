@@ -0,0 +1,26 @@
+"""updated_at on Venue, Artist and Shows
+
+Revision ID: c5a1f7e2d840
+Revises: b7e4d09c3f15
+Create Date: 2026-10-18 19:48:03.271946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a1f7e2d840'
+down_revision = 'b7e4d09c3f15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist', 'Shows'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade():
+    for table in ('Shows', 'Artist', 'Venue'):
+        op.drop_column(table, 'updated_at')
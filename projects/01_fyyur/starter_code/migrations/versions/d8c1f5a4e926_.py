@@ -0,0 +1,36 @@
+"""GenreCount: unfiltered genre facet counts
+
+Revision ID: d8c1f5a4e926
+Revises: a6d2e8b3f471
+Create Date: 2026-10-19 10:12:44.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8c1f5a4e926'
+down_revision = 'a6d2e8b3f471'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('GenreCount',
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('genre', sa.String(length=120), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'genre')
+    )
+    # backfill from the existing venues and artists
+    for table in ('Venue', 'Artist'):
+        op.execute(
+            'INSERT INTO "GenreCount" (kind, genre, count) '
+            "SELECT '{0}', genre, count(*) FROM "
+            '(SELECT unnest(genres) AS genre FROM "{0}") AS genres '
+            'WHERE genre IS NOT NULL GROUP BY genre'.format(table))
+
+
+def downgrade():
+    op.drop_table('GenreCount')
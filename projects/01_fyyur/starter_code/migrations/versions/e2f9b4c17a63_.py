@@ -0,0 +1,34 @@
+"""show duration and no overlapping bookings per venue or artist
+
+Revision ID: e2f9b4c17a63
+Revises: c5a1f7e2d840
+Create Date: 2026-10-18 21:12:40.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f9b4c17a63'
+down_revision = 'c5a1f7e2d840'
+branch_labels = None
+depends_on = None
+
+SPAN = "tsrange(start_date, start_date + duration * interval '1 minute')"
+
+
+def upgrade():
+    op.add_column('Shows', sa.Column('duration', sa.Integer(), server_default='120', nullable=False))
+    # btree_gist lets the integer ids share a GiST index with the time range;
+    # overlapping shows already in the table have to be moved before this runs
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for side in ('venue', 'artist'):
+        op.execute('ALTER TABLE "Shows" ADD CONSTRAINT ex_shows_{0}_booking '
+                   'EXCLUDE USING gist ({0}_id WITH =, {1} WITH &&)'.format(side, SPAN))
+
+
+def downgrade():
+    for side in ('artist', 'venue'):
+        op.drop_constraint('ex_shows_{}_booking'.format(side), 'Shows')
+    op.drop_column('Shows', 'duration')
@@ -0,0 +1,35 @@
+"""VenueDirectory: the /venues listing, one row per city
+
+Revision ID: f3a8c61d5e92
+Revises: e2f9b4c17a63
+Create Date: 2026-10-18 22:05:17.804419
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c61d5e92'
+down_revision = 'e2f9b4c17a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('VenueDirectory',
+    sa.Column('city', sa.String(length=120), nullable=False),
+    sa.Column('state', sa.String(length=120), nullable=False),
+    sa.Column('venues', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('city', 'state')
+    )
+    # backfill from the existing venues
+    op.execute(
+        'INSERT INTO "VenueDirectory" (city, state, venues) '
+        "SELECT city, state, json_agg(json_build_object("
+        "'id', id, 'name', name, 'num_upcoming_shows', upcoming_shows_count) ORDER BY id) "
+        'FROM "Venue" WHERE city IS NOT NULL AND state IS NOT NULL GROUP BY city, state')
+
+
+def downgrade():
+    op.drop_table('VenueDirectory')
@@ -1,8 +1,22 @@
-from app import db
+from datetime import datetime, timedelta
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql
+
+# bound to the app by create_app() (see app.py)
+db = SQLAlchemy()
+
+# genres are Postgres arrays; the sqlite variant lets the tests run without a server
+Genres = postgresql.ARRAY(db.String()).with_variant(db.JSON(), 'sqlite')
+
+# length of a show when the booking does not say, in minutes
+SHOW_MINUTES = 120
 
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_venue_city_state', 'city', 'state'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -10,12 +24,20 @@ class Venue(db.Model):
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.Column(Genres)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     talent_description = db.Column(db.String(400))
+    # maintained by counters.py, rolled from upcoming to past by reconcile_show_counts
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # last change to the row, for the API's ETags; counter updates leave it alone
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=db.func.now())
+    # bumped by every edit (see editing.py); an edit made against an older version is refused
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     shows = db.relationship('Show',cascade = "all,delete", backref = "venue" , lazy = True)
 
     def __repr__(self):
@@ -29,12 +51,17 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.Column(Genres)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     seeking_venues = db.Column(db.Boolean)
     venue_description = db.Column(db.String(400))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     shows = db.relationship('Show',cascade = "all,delete" , backref="artist", lazy=True)
   
     def __repr__(self):
@@ -42,9 +69,48 @@ class Artist(db.Model):
 
 class Show(db.Model):
   __tablename__ = 'Shows'
+  __table_args__ = (
+    db.Index('ix_shows_venue_start_date', 'venue_id', 'start_date'),
+    db.Index('ix_shows_artist_start_date', 'artist_id', 'start_date'),
+  )
   id = db.Column(db.Integer , primary_key=True)
   artist_id = db.Column(db.Integer , db.ForeignKey('Artist.id') , nullable=False)
   venue_id = db.Column(db.Integer , db.ForeignKey('Venue.id') , nullable=False)
   start_date = db.Column(db.DateTime , nullable = False)
+  # minutes; booking.py keeps a venue's or artist's shows from overlapping
+  duration = db.Column(db.Integer, nullable=False, default=SHOW_MINUTES,
+                       server_default=str(SHOW_MINUTES))
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                         onupdate=datetime.utcnow, server_default=db.func.now())
+
+  @property
+  def end_date(self):
+    return self.start_date + timedelta(minutes=self.duration)
+
   def __repr__(self):
     return f'<artist''s id: {self.artist_id} , venue''s id: {self.venue_id} >'
+
+
+class Area(db.Model):
+    # the /venues directory, one row per city; kept in step with Venue by directory.py
+    __tablename__ = 'VenueDirectory'
+
+    city = db.Column(db.String(120), primary_key=True)
+    state = db.Column(db.String(120), primary_key=True)
+    # [{"id", "name", "num_upcoming_shows"}, ...] in venue id order
+    venues = db.Column(db.JSON, nullable=False)
+
+    def __repr__(self):
+      return f'<area: {self.city}, {self.state}>'
+
+
+class GenreCount(db.Model):
+    # unfiltered genre facet counts per table ('Venue', 'Artist'); kept in step by facets.py
+    __tablename__ = 'GenreCount'
+
+    kind = db.Column(db.String(20), primary_key=True)
+    genre = db.Column(db.String(120), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+      return f'<genre count: {self.kind} {self.genre} {self.count}>'
@@ -0,0 +1,112 @@
+#----------------------------------------------------------------------------#
+# Connection pool.
+#
+# The engine's pool is sized from config.py (DB_POOL_* settings). Requests
+# for a connection are timed by TimedQueuePool, and pool events keep running
+# totals, so /pool/stats can show checked-out/idle connections and how long
+# requests waited for one when sizing the pool.
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.pool import Pool, QueuePool
+
+
+class PoolStats(object):
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.reset()
+
+  def reset(self):
+    with self._lock:
+      self.connects = 0
+      self.checkouts = 0
+      self.checkins = 0
+      self.invalidations = 0
+      self.waits = 0
+      self.wait_seconds = 0.0
+      self.max_wait_seconds = 0.0
+      self.timeouts = 0
+
+  def count(self, name):
+    with self._lock:
+      setattr(self, name, getattr(self, name) + 1)
+
+  def record_wait(self, seconds, timed_out=False):
+    with self._lock:
+      self.waits += 1
+      self.wait_seconds += seconds
+      self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+      if timed_out:
+        self.timeouts += 1
+
+  def stats(self, pool):
+    with self._lock:
+      totals = {
+        "connects": self.connects,
+        "checkouts": self.checkouts,
+        "checkins": self.checkins,
+        "invalidations": self.invalidations,
+        "timeouts": self.timeouts,
+        "avg_wait_ms": 1000 * self.wait_seconds / self.waits if self.waits else 0.0,
+        "max_wait_ms": 1000 * self.max_wait_seconds,
+      }
+    # gauges are only available on queue pools (not sqlite's static pool)
+    totals["pool"] = type(pool).__name__
+    for gauge in ('size', 'checkedout', 'checkedin', 'overflow'):
+      if hasattr(pool, gauge):
+        totals[gauge] = getattr(pool, gauge)()
+    return totals
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+  # QueuePool that records how long each checkout waited for a connection
+
+  def _do_get(self):
+    started = time.perf_counter()
+    try:
+      connection = super(TimedQueuePool, self)._do_get()
+    except Exception:
+      pool_stats.record_wait(time.perf_counter() - started, timed_out=True)
+      raise
+    pool_stats.record_wait(time.perf_counter() - started)
+    return connection
+
+
+@event.listens_for(Pool, 'connect')
+def _connect(dbapi_connection, connection_record):
+  pool_stats.count('connects')
+
+
+@event.listens_for(Pool, 'checkout')
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+  pool_stats.count('checkouts')
+
+
+@event.listens_for(Pool, 'checkin')
+def _checkin(dbapi_connection, connection_record):
+  pool_stats.count('checkins')
+
+
+@event.listens_for(Pool, 'invalidate')
+def _invalidate(dbapi_connection, connection_record, exception):
+  pool_stats.count('invalidations')
+
+
+def engine_options(uri, size, max_overflow, timeout, recycle, pre_ping):
+  # SQLALCHEMY_ENGINE_OPTIONS for create_app(); sqlite keeps Flask-SQLAlchemy's pool
+  if uri.startswith('sqlite'):
+    return {}
+  return {
+    "poolclass": TimedQueuePool,
+    "pool_size": size,
+    "max_overflow": max_overflow,
+    "pool_timeout": timeout,
+    "pool_recycle": recycle,
+    "pool_pre_ping": pre_ping,
+  }
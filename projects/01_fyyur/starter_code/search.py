@@ -0,0 +1,123 @@
+#----------------------------------------------------------------------------#
+# Search.
+#
+# Venue and artist search matches the name, city and genres of each row and
+# returns ranked, paginated results from an index instead of a table scan:
+#   * Postgres: pg_trgm GIN indexes on name/city and a GIN index on genres
+#     (migrations/versions/9d31b6e5a2c4_.py, or create_all() through the
+#     DDL below); ranked by similarity().
+#   * SQLite: an FTS5 trigram table per model, kept in sync by triggers
+#     (updates only when a searched column changes); ranked by bm25. This
+#     is what the tests run against.
+# Both match a term anywhere in a genre name ("jaz" finds Jazz): the trigram
+# table does so directly, Postgres looks the term up among the genre choices
+# and matches rows holding any of them on the genres index.
+# Terms shorter than a trigram cannot use either index and fall back to a
+# plain ILIKE scan.
+#----------------------------------------------------------------------------#
+
+from functools import lru_cache
+from sqlalchemy import DDL, event, func, or_, table, column, literal_column
+from models import db, Venue, Artist
+
+PER_PAGE = 20
+
+
+@lru_cache(maxsize=1)
+def genre_names():
+  # lower-cased genre name -> stored genre value; loads the forms on first use
+  from forms import VenueForm
+  return {value.lower(): value for value, _ in VenueForm.genres.kwargs['choices']}
+
+
+def matching_genres(term):
+  # the genre values whose name contains `term`, ignoring case
+  term = term.strip().lower()
+  return [value for name, value in genre_names().items() if term in name]
+
+
+def _fts_table(model):
+  return '{}_search'.format(model.__tablename__.lower())
+
+
+for _model in (Venue, Artist):
+  _fts = _fts_table(_model)
+  _table = _model.__tablename__
+  _columns = 'name, city, genres'
+  _new = 'new.id, new.name, new.city, new.genres'
+  _old = "'delete', old.id, old.name, old.city, old.genres"
+  for _ddl in (
+    "CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content='{table}', "
+    "content_rowid='id', tokenize='trigram')",
+    'CREATE TRIGGER {fts}_ai AFTER INSERT ON "{table}" BEGIN '
+    'INSERT INTO {fts}(rowid, {columns}) VALUES ({new}); END',
+    'CREATE TRIGGER {fts}_ad AFTER DELETE ON "{table}" BEGIN '
+    'INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ({old}); END',
+    'CREATE TRIGGER {fts}_au AFTER UPDATE OF {columns} ON "{table}" BEGIN '
+    'INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ({old}); '
+    'INSERT INTO {fts}(rowid, {columns}) VALUES ({new}); END',
+  ):
+    event.listen(_model.__table__, 'after_create', DDL(_ddl.format(
+      fts=_fts, table=_table, columns=_columns, new=_new, old=_old
+    )).execute_if(dialect='sqlite'))
+  event.listen(_model.__table__, 'before_drop', DDL(
+    'DROP TABLE IF EXISTS {}'.format(_fts)).execute_if(dialect='sqlite'))
+  # the same indexes as migration 9d31b6e5a2c4, for databases built by create_all()
+  _prefix = 'ix_{}'.format(_table.lower())
+  for _ddl in (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS {prefix}_name_trgm ON "{table}" USING gin (name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS {prefix}_city_trgm ON "{table}" USING gin (city gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS {prefix}_genres ON "{table}" USING gin (genres)',
+  ):
+    event.listen(_model.__table__, 'after_create', DDL(_ddl.format(
+      prefix=_prefix, table=_table)).execute_if(dialect='postgresql'))
+
+
+def _ranked(model, term):
+  term = term.strip()
+  pattern = '%{}%'.format(term)
+  scan = or_(model.name.ilike(pattern), model.city.ilike(pattern))
+  dialect = db.engine.dialect.name
+
+  if len(term) < 3:
+    return model.query.filter(scan).order_by(model.name, model.id)
+
+  if dialect == 'sqlite':
+    fts = table(_fts_table(model), column('rowid'), column('rank'))
+    phrase = '"{}"'.format(term.replace('"', '""'))
+    matches = db.session.query(fts.c.rowid.label('id'), fts.c.rank.label('rank')
+      ).filter(literal_column(fts.name).op('MATCH')(phrase)
+      ).subquery()
+    return model.query.join(matches, matches.c.id == model.id
+      ).order_by(matches.c.rank, model.id)
+
+  match = scan
+  genres = matching_genres(term)
+  if genres:
+    match = or_(match, model.genres.overlap(genres))
+  rank = func.greatest(func.similarity(model.name, term),
+                       func.similarity(model.city, term))
+  return model.query.filter(match).order_by(rank.desc(), model.id)
+
+
+def _results(model, term, page, per_page):
+  pagination = _ranked(model, term).paginate(page, per_page, error_out=False)
+  return {
+    "count": pagination.total,
+    "page": pagination.page,
+    "pages": pagination.pages,
+    "data": [{
+      "id": row.id,
+      "name": row.name,
+      "num_upcoming_shows": row.upcoming_shows_count
+    } for row in pagination.items]
+  }
+
+
+def find_venues(term, page=1, per_page=PER_PAGE):
+  return _results(Venue, term, page, per_page)
+
+
+def find_artists(term, page=1, per_page=PER_PAGE):
+  return _results(Artist, term, page, per_page)
@@ -0,0 +1,150 @@
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#
+#   flask seed-data --venues 1000 --artists 3000 --shows 50000 --seed 1
+#
+# Builds a reproducible catalog through the model classes: cities weighted
+# by size, one to three genres per venue/artist with popular genres more
+# likely, and shows skewed towards popular venues and artists, mostly in the
+# evening, spread over the last two years and the next six months.
+#----------------------------------------------------------------------------#
+
+import random
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from models import db, Venue, Artist, Show
+from search import genre_names
+from counters import reconcile_show_counts
+from booking import timelines
+from cache import page_cache
+from typeahead import typeahead
+
+# (city, state, weight)
+CITIES = [
+  ('New York', 'NY', 20), ('Los Angeles', 'CA', 14), ('Chicago', 'IL', 9),
+  ('Houston', 'TX', 7), ('San Francisco', 'CA', 6), ('Austin', 'TX', 6),
+  ('Seattle', 'WA', 5), ('Nashville', 'TN', 5), ('New Orleans', 'LA', 4),
+  ('Denver', 'CO', 4), ('Portland', 'OR', 3), ('Atlanta', 'GA', 3),
+  ('Boston', 'MA', 3), ('Detroit', 'MI', 2), ('Memphis', 'TN', 2),
+  ('Minneapolis', 'MN', 2), ('Philadelphia', 'PA', 2), ('Miami', 'FL', 2),
+]
+NAME_WORDS = [
+  'Blue', 'Velvet', 'Hop', 'Musical', 'Square', 'Live', 'Dueling', 'Golden',
+  'Silver', 'Electric', 'Echo', 'Neon', 'Midnight', 'Wild', 'Sax', 'Petals',
+  'Lantern', 'Harbor', 'Moon', 'Copper', 'River', 'Attic', 'Basement', 'Union',
+]
+VENUE_KINDS = ['Hall', 'Lounge', 'Club', 'Room', 'Theatre', 'Bar', 'Cafe', 'Garden']
+ARTIST_KINDS = ['Band', 'Trio', 'Quartet', 'Collective', 'Orchestra', 'Project']
+SHOW_HOURS = [19, 20, 20, 21, 21, 22]
+DAY_TRIES = 20
+BATCH = 1000
+
+
+def _weights(count, rng):
+  # heavy-tailed popularity so a few venues/artists host most shows
+  return [rng.paretovariate(1.2) for _ in range(count)]
+
+
+def _place(rng):
+  city, state, _ = rng.choices(CITIES, weights=[weight for _, _, weight in CITIES])[0]
+  return city, state
+
+
+def _genres(rng, genres, genre_weights):
+  return sorted(set(rng.choices(genres, weights=genre_weights, k=rng.randint(1, 3))))
+
+
+def _save(objects):
+  for start in range(0, len(objects), BATCH):
+    db.session.bulk_save_objects(objects[start:start + BATCH])
+    db.session.commit()
+
+
+def generate(venues=100, artists=300, shows=2000, seed=0, now=None):
+  """Adds a synthetic catalog.
+
+  Returns every venue id and artist id in the database, and the number of
+  venues, artists and shows added: fewer shows than asked for when some
+  bookings found no free day.
+  """
+  if now is None:
+    now = datetime.now()
+  rng = random.Random(seed)
+  genres = list(genre_names().values())
+  genre_weights = [1.0 / (rank + 1) for rank in range(len(genres))]
+  rng.shuffle(genre_weights)
+
+  new_venues = list()
+  for i in range(venues):
+    city, state = _place(rng)
+    name = '{} {} {}'.format(rng.choice(NAME_WORDS), rng.choice(VENUE_KINDS), i)
+    new_venues.append(Venue(
+      name=name, city=city, state=state,
+      address='{} {} St'.format(rng.randint(1, 9999), rng.choice(NAME_WORDS)),
+      phone='{}-{}-{}'.format(rng.randint(200, 999), rng.randint(200, 999), rng.randint(1000, 9999)),
+      genres=_genres(rng, genres, genre_weights),
+      image_link='https://images.example.com/venues/{}.jpg'.format(i),
+      facebook_link='https://www.facebook.com/venue{}'.format(i),
+      website_link='https://venue{}.example.com'.format(i),
+      seeking_talent=rng.random() < 0.4,
+      talent_description='Looking for local acts.'))
+  _save(new_venues)
+
+  new_artists = list()
+  for i in range(artists):
+    city, state = _place(rng)
+    name = 'The {} {} {}'.format(rng.choice(NAME_WORDS), rng.choice(ARTIST_KINDS), i)
+    new_artists.append(Artist(
+      name=name, city=city, state=state,
+      phone='{}-{}-{}'.format(rng.randint(200, 999), rng.randint(200, 999), rng.randint(1000, 9999)),
+      genres=_genres(rng, genres, genre_weights),
+      image_link='https://images.example.com/artists/{}.jpg'.format(i),
+      facebook_link='https://www.facebook.com/artist{}'.format(i),
+      website_link='https://artist{}.example.com'.format(i),
+      seeking_venues=rng.random() < 0.5,
+      venue_description='Looking for places to play.'))
+  _save(new_artists)
+
+  venue_ids = [id for id, in db.session.query(Venue.id).order_by(Venue.id)]
+  artist_ids = [id for id, in db.session.query(Artist.id).order_by(Artist.id)]
+  new_shows = list()
+  if venue_ids and artist_ids and shows:
+    venue_weights = _weights(len(venue_ids), rng)
+    artist_weights = _weights(len(artist_ids), rng)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    # at most one show a day per venue and per artist, so no two bookings
+    # overlap; a pair that finds no free day in a few tries is dropped
+    booked = set()
+    for venue_id, artist_id in zip(rng.choices(venue_ids, weights=venue_weights, k=shows),
+                                   rng.choices(artist_ids, weights=artist_weights, k=shows)):
+      for _ in range(DAY_TRIES):
+        day = rng.randint(-730, 180)
+        if ('venue', venue_id, day) not in booked and ('artist', artist_id, day) not in booked:
+          break
+      else:
+        continue
+      booked.update((('venue', venue_id, day), ('artist', artist_id, day)))
+      start = today + timedelta(days=day, hours=rng.choice(SHOW_HOURS),
+                                minutes=rng.choice((0, 30)))
+      new_shows.append(Show(venue_id=venue_id, artist_id=artist_id, start_date=start))
+    _save(new_shows)
+
+  reconcile_show_counts(now)
+  timelines.clear()
+  typeahead.clear()
+  page_cache.bump('venue', 'artist')
+  added = {'venues': len(new_venues), 'artists': len(new_artists), 'shows': len(new_shows)}
+  return venue_ids, artist_ids, added
+
+
+@click.command('seed-data')
+@click.option('--venues', default=100, show_default=True)
+@click.option('--artists', default=300, show_default=True)
+@click.option('--shows', default=2000, show_default=True)
+@click.option('--seed', default=0, show_default=True)
+@with_appcontext
+def seed_data_command(venues, artists, shows, seed):
+  """Fill the database with a synthetic catalog."""
+  _, _, added = generate(venues, artists, shows, seed)
+  click.echo('Added {venues} venues, {artists} artists and {shows} shows.'.format(**added))
@@ -2,3 +2,29 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// name inputs with data-typeahead fill the hidden id field named by data-target
+document.querySelectorAll('input[data-typeahead]').forEach(function (input) {
+  var list = document.getElementById(input.getAttribute('list'));
+  var target = document.getElementById(input.dataset.target);
+  var ids = {};
+  input.addEventListener('input', function () {
+    target.value = ids[input.value] || '';
+    if (target.value) {
+      return;
+    }
+    fetch(input.dataset.typeahead + '?q=' + encodeURIComponent(input.value))
+      .then(function (response) { return response.json(); })
+      .then(function (result) {
+        list.innerHTML = '';
+        result.data.forEach(function (match) {
+          var label = match.name + ' (#' + match.id + ')';
+          var option = document.createElement('option');
+          option.value = label;
+          ids[label] = match.id;
+          list.appendChild(option);
+        });
+        target.value = ids[input.value] || '';
+      });
+  });
+});
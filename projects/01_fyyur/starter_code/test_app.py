@@ -0,0 +1,791 @@
+import atexit
+import os
+import tempfile
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app import create_app
+from models import db, Venue, Artist, Show
+from counters import reconcile_show_counts
+from cache import page_cache
+from booking import BookingConflict, book_show, timelines
+from typeahead import typeahead
+
+app = create_app()
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and create the tables."""
+        app.config['TESTING'] = True
+        self.client = app.test_client
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        page_cache.clear()
+        timelines.clear()
+        typeahead.clear()
+
+    def tearDown(self):
+        """Executed after reach test"""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    @contextmanager
+    def count_queries(self):
+        statements = list()
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    def query_plans(self, action):
+        """Run action and return the query plan of every statement it issued."""
+        captured = list()
+
+        def before_cursor_execute(conn, cursor, statement, parameters, *args):
+            captured.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            action()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        plans = list()
+        with db.engine.connect() as conn:
+            if db.engine.dialect.name == 'sqlite':
+                explain = 'EXPLAIN QUERY PLAN '
+            else:
+                # the test tables are tiny; make the planner show what it would use
+                conn.exec_driver_sql('SET enable_seqscan = off')
+                explain = 'EXPLAIN '
+            for statement, parameters in captured:
+                if statement.lstrip().upper().startswith(('SELECT', 'UPDATE')):
+                    rows = conn.exec_driver_sql(explain + statement, parameters)
+                    plans.append(' '.join(str(row) for row in rows))
+        return '\n'.join(plans)
+
+    def add_catalog(self, num_venues, cities=3):
+        artist = Artist(name='Artist', city='San Francisco', state='CA', genres=['Jazz'])
+        db.session.add(artist)
+        now = datetime.now()
+        for i in range(num_venues):
+            venue = Venue(name='Venue {}'.format(i), city='City {}'.format(i % cities),
+                          state='CA', genres=['Jazz'])
+            venue.shows = [
+                Show(artist=artist, start_date=now + timedelta(days=1)),
+                Show(artist=artist, start_date=now + timedelta(days=2)),
+                Show(artist=artist, start_date=now - timedelta(days=1)),
+            ]
+            db.session.add(venue)
+        db.session.commit()
+        reconcile_show_counts()
+        page_cache.bump('venue', 'artist', 'show')
+        return artist
+
+    def test_venues(self):
+        self.add_catalog(4)
+        res = self.client().get('/venues')
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'City 0, CA', res.data)
+        self.assertIn(b'Venue 3', res.data)
+
+    def test_venue_areas(self):
+        from listings import venue_areas
+        self.add_catalog(4)
+        db.session.add(Venue(name='Empty', city='City 0', state='CA'))
+        db.session.commit()
+        areas = venue_areas()
+        self.assertEqual([(a['city'], a['state']) for a in areas],
+                         [('City 0', 'CA'), ('City 1', 'CA'), ('City 2', 'CA')])
+        counts = {v['name']: v['num_upcoming_shows'] for a in areas for v in a['venues']}
+        self.assertEqual(counts['Venue 0'], 2)
+        self.assertEqual(counts['Empty'], 0)
+
+    def test_venues_query_count_is_constant(self):
+        self.add_catalog(2)
+        with self.count_queries() as few:
+            self.client().get('/venues')
+        self.add_catalog(30, cities=10)
+        with self.count_queries() as many:
+            self.client().get('/venues')
+        # the areas and the genre facets
+        self.assertEqual(len(few), 2)
+        self.assertEqual(len(many), len(few))
+
+    def test_create_show_updates_counters(self):
+        artist_id = self.add_catalog(1).id
+        venue_id = Venue.query.first().id
+        res = self.client().post('/shows/create', data={
+            'artist_id': artist_id,
+            'venue_id': venue_id,
+            'start_time': (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d %H:%M:%S')
+        })
+        self.assertEqual(res.status_code, 200)
+        venue = Venue.query.get(venue_id)
+        self.assertEqual((venue.upcoming_shows_count, venue.past_shows_count), (3, 1))
+        self.assertEqual(Artist.query.get(artist_id).upcoming_shows_count, 3)
+
+    def test_delete_venue_releases_artist_counters(self):
+        artist_id = self.add_catalog(3).id
+        venue_id = Venue.query.first().id
+        res = self.client().delete('/venues/{}'.format(venue_id))
+        self.assertEqual(res.status_code, 204)
+        artist = Artist.query.get(artist_id)
+        self.assertEqual((artist.upcoming_shows_count, artist.past_shows_count), (4, 2))
+        self.assertIsNone(Venue.query.get(venue_id))
+        self.assertEqual(self.client().delete('/venues/{}'.format(venue_id)).status_code, 404)
+
+    def test_reconcile_rolls_upcoming_to_past(self):
+        artist = self.add_catalog(1)
+        reconcile_show_counts(now=datetime.now() + timedelta(days=1, hours=12))
+        venue = Venue.query.first()
+        self.assertEqual((venue.upcoming_shows_count, venue.past_shows_count), (1, 2))
+        Venue.query.update({Venue.upcoming_shows_count: 7})
+        db.session.commit()
+        reconcile_show_counts()
+        self.assertEqual(Venue.query.first().upcoming_shows_count, 2)
+        # nothing is off any more, so nothing is rewritten
+        self.assertEqual(reconcile_show_counts(), 0)
+
+    def test_search_venues_reads_counters(self):
+        self.add_catalog(5)
+        with self.count_queries() as statements:
+            res = self.client().post('/venues/search', data={'search_term': 'venue'})
+        self.assertIn(b': 5', res.data)
+        # one page of rows plus the total count
+        self.assertEqual(len(statements), 2)
+
+    def test_find_venues_ranks_and_paginates(self):
+        from search import find_venues
+        self.add_catalog(3)
+        db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA',
+                             genres=['Jazz', 'Reggae']))
+        db.session.add(Venue(name='Park Square Live Music & Coffee', city='San Francisco',
+                             state='CA', genres=['Rock n Roll', 'Jazz']))
+        db.session.commit()
+        self.assertEqual([v['name'] for v in find_venues('Hop')['data']], ['The Musical Hop'])
+        self.assertEqual(find_venues('music')['count'], 2)
+        self.assertEqual(find_venues('francisco')['count'], 2)
+        self.assertEqual(find_venues('reggae')['count'], 1)
+        # genres match on part of their name, as on Postgres (see matching_genres)
+        from search import matching_genres
+        self.assertEqual(find_venues('eggae')['count'], 1)
+        self.assertEqual(matching_genres('eggae'), ['Reggae'])
+        self.assertIn('Rock n Roll', matching_genres('roll'))
+        page = find_venues('venue', page=2, per_page=2)
+        self.assertEqual((page['count'], page['pages'], len(page['data'])), (3, 2, 1))
+
+    def test_search_results_link_next_page(self):
+        from search import PER_PAGE
+        self.add_catalog(PER_PAGE + 5)
+        res = self.client().post('/venues/search', data={'search_term': 'venue'})
+        self.assertIn(b'Page 1 of 2', res.data)
+        self.assertIn(b'action="/venues/search?page=2"', res.data)
+        res = self.client().post('/venues/search?page=2', data={'search_term': 'venue'})
+        self.assertIn(b'Page 2 of 2', res.data)
+        self.assertIn(b'action="/venues/search?page=1"', res.data)
+        self.assertEqual(res.data.count(b'<h5>'), 5)
+
+    def test_search_index_follows_edits(self):
+        from search import find_artists
+        self.add_catalog(1)
+        artist = Artist.query.first()
+        artist.name = 'The Wild Sax Band'
+        db.session.commit()
+        self.assertEqual(find_artists('sax band')['count'], 1)
+        self.assertEqual(find_artists('artist')['count'], 0)
+
+    def test_show_venue_partitions_shows(self):
+        from listings import venue_detail
+        self.add_catalog(1)
+        venue = venue_detail(Venue.query.first().id)
+        self.assertEqual((venue['past_shows_count'], venue['upcoming_shows_count']), (1, 2))
+        self.assertEqual(venue['upcoming_shows'][0]['artist_name'], 'Artist')
+        self.assertLess(venue['upcoming_shows'][0]['start_time'],
+                        venue['upcoming_shows'][1]['start_time'])
+
+    def test_detail_pages_query_count_is_constant(self):
+        self.add_catalog(1)
+        venue_id = Venue.query.first().id
+        artist_id = Artist.query.first().id
+        with self.count_queries() as few:
+            self.client().get('/venues/{}'.format(venue_id))
+            self.client().get('/artists/{}'.format(artist_id))
+        self.add_catalog(20, cities=1)
+        with self.count_queries() as many:
+            res = self.client().get('/venues/{}'.format(venue_id))
+            self.assertEqual(res.status_code, 200)
+            res = self.client().get('/artists/{}'.format(artist_id))
+            self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(few), 4)
+        self.assertEqual(len(many), len(few))
+
+    def test_404_detail_pages(self):
+        self.assertEqual(self.client().get('/venues/1000').status_code, 404)
+        self.assertEqual(self.client().get('/artists/1000').status_code, 404)
+
+    def test_shows_keyset_pages(self):
+        self.add_catalog(4)
+        res = self.client().get('/shows?limit=5')
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.is_streamed)
+        self.assertEqual(res.data.count(b'tile-show'), 5)
+        self.assertIn(b'/shows?after=', res.data)
+        from listings import shows_page, parse_show_cursor
+        page = shows_page(limit=5)
+        first = list(page)
+        self.assertIsNotNone(page.next_cursor)
+        rest = list(shows_page(parse_show_cursor(page.next_cursor), limit=100))
+        self.assertEqual(len(first) + len(rest), 12)
+        starts = [show['start_time'] for show in first + rest]
+        self.assertEqual(starts, sorted(starts))
+
+    def test_shows_query_count_is_constant(self):
+        self.add_catalog(2)
+        with self.count_queries() as few:
+            self.client().get('/shows').data
+        self.add_catalog(30)
+        with self.count_queries() as many:
+            self.client().get('/shows').data
+        self.assertEqual(len(few), 1)
+        self.assertEqual(len(many), len(few))
+
+    def test_400_bad_show_cursor(self):
+        self.assertEqual(self.client().get('/shows?after=nope').status_code, 400)
+
+    def test_artists_keyset_pages(self):
+        for i in range(3):
+            db.session.add(Artist(name='Artist {}'.format(i)))
+        db.session.commit()
+        res = self.client().get('/artists?limit=2')
+        self.assertIn(b'Artist 1', res.data)
+        self.assertNotIn(b'Artist 2', res.data)
+        res = self.client().get('/artists?after=2')
+        self.assertIn(b'Artist 2', res.data)
+        self.assertNotIn(b'Next', res.data)
+
+    def test_cached_page_is_served_without_queries(self):
+        self.add_catalog(2)
+        first = self.client().get('/venues').data
+        with self.count_queries() as statements:
+            res = self.client().get('/venues')
+        self.assertEqual(res.data, first)
+        self.assertEqual(len(statements), 0)
+        stats = self.client().get('/cache/stats').get_json()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_streamed_page_is_cached_once_complete(self):
+        self.add_catalog(2)
+        first = self.client().get('/shows').data
+        with self.count_queries() as statements:
+            res = self.client().get('/shows')
+        self.assertEqual(res.data, first)
+        self.assertEqual(len(statements), 0)
+
+    def test_write_handlers_invalidate_cached_pages(self):
+        self.add_catalog(1)
+        venue_id = Venue.query.first().id
+        self.client().get('/venues/{}'.format(venue_id))
+        self.client().post('/venues/{}/edit'.format(venue_id), data={
+            'name': 'Renamed Venue', 'city': 'City 0', 'state': 'CA', 'address': '',
+            'phone': '', 'genres': ['Jazz'], 'image_link': '', 'facebook_link': '',
+            'website_link': '', 'seeking_description': '', 'version': 1
+        })
+        res = self.client().get('/venues/{}'.format(venue_id))
+        self.assertIn(b'Renamed Venue', res.data)
+
+    def test_cache_evicts_least_recently_used(self):
+        from cache import PageCache
+        cache = PageCache(max_entries=2, ttl=60)
+        cache.set('a', b'a')
+        cache.set('b', b'b')
+        cache.get('a')
+        cache.set('c', b'c')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'a')
+        cache.ttl = -1
+        cache.set('d', b'd')
+        self.assertIsNone(cache.get('d'))
+
+    def test_format_datetime_matches_babel(self):
+        import babel.dates
+        from filters import format_datetime, format_datetimes
+        value = datetime(2035, 4, 1, 20, 30)
+        self.assertEqual(format_datetime(value, 'full'),
+                         babel.dates.format_datetime(value, "EEEE MMMM, d, y 'at' h:mma", locale='en'))
+        self.assertEqual(format_datetime('2035-04-01T20:30:00'), format_datetime(value))
+        self.assertEqual(format_datetime(value, 'yyyy-MM-dd'), '2035-04-01')
+        self.assertEqual(format_datetimes([value, value], 'full'), [format_datetime(value, 'full')] * 2)
+
+    def test_import_data_validates_batches_and_resumes(self):
+        venue_fields = 'name,city,state,address,phone,genres,facebook_link,website_link,image_link'
+        with tempfile.TemporaryDirectory() as tmp:
+            venues = os.path.join(tmp, 'venues.csv')
+            with open(venues, 'w') as out:
+                out.write(venue_fields + '\n')
+                for i in range(5):
+                    out.write('Venue {},Austin,TX,1 Main St,123,Jazz;Blues,https://www.facebook.com/v,,\n'.format(i))
+                out.write(',Austin,TX,1 Main St,123,Jazz,,,\n')
+                out.write('Bad Genre,Austin,TX,1 Main St,123,Polka,https://www.facebook.com/v,,\n')
+            runner = app.test_cli_runner()
+            result = runner.invoke(args=['import-data', 'venues', venues, '--batch-size', '2'])
+            self.assertIn('Imported 5 venues (2 rejected)', result.output)
+            self.assertEqual(Venue.query.count(), 5)
+            self.assertEqual(Venue.query.first().genres, ['Jazz', 'Blues'])
+            # a finished import leaves a checkpoint; running it again adds nothing
+            result = runner.invoke(args=['import-data', 'venues', venues])
+            self.assertIn('Imported 0 venues', result.output)
+            self.assertEqual(Venue.query.count(), 5)
+
+            artist = Artist(name='Artist')
+            db.session.add(artist)
+            db.session.commit()
+            shows = os.path.join(tmp, 'shows.jsonl')
+            with open(shows, 'w') as out:
+                out.write('{"artist_id": %d, "venue_id": 1, "start_time": "2035-01-01 20:00:00"}\n' % artist.id)
+                out.write('{"artist_id": %d, "venue_id": 999, "start_time": "2035-01-01 20:00:00"}\n' % artist.id)
+                out.write('{"artist_id": "x", "venue_id": 1, "start_time": "2035-01-01 20:00:00"}\n')
+                # the artist is already playing venue 1 then
+                out.write('{"artist_id": %d, "venue_id": 2, "start_time": "2035-01-01 21:00:00"}\n' % artist.id)
+            result = runner.invoke(args=['import-data', 'shows', shows])
+            self.assertIn('Imported 1 shows (3 rejected)', result.output)
+            self.assertIn('the artist is already booked', result.output)
+            self.assertEqual(Venue.query.get(1).upcoming_shows_count, 1)
+
+            # rows overlapping stored shows are rejected too, and book_show() sees the imported ones
+            other = Artist(name='Other')
+            db.session.add(other)
+            db.session.commit()
+            other_id = other.id
+            more = os.path.join(tmp, 'more.jsonl')
+            with open(more, 'w') as out:
+                out.write('{"artist_id": %d, "venue_id": 1, "start_time": "2035-01-01 21:00:00"}\n' % other_id)
+                out.write('{"artist_id": %d, "venue_id": 2, "start_time": "2035-01-01 21:00:00"}\n' % other_id)
+                out.write('{"artist_id": %d, "venue_id": 3, "start_time": "2035-01-01 21:30:00"}\n' % other_id)
+            result = runner.invoke(args=['import-data', 'shows', more, '--batch-size', '1'])
+            self.assertIn('Imported 1 shows (2 rejected)', result.output)
+            self.assertIn('the venue is already booked', result.output)
+            with self.assertRaises(BookingConflict):
+                book_show(other_id, 3, datetime(2035, 1, 1, 22, 0))
+
+    def test_hot_queries_use_indexes(self):
+        self.add_catalog(3)
+        venue_id = Venue.query.first().id
+        artist_id = Artist.query.first().id
+        plans = self.query_plans(lambda: self.client().get('/venues'))
+        self.assertIn('VenueDirectory', plans)
+        from directory import refresh_areas
+        plans = self.query_plans(
+            lambda: (refresh_areas([('City 0', 'CA')]), db.session.commit()))
+        self.assertIn('ix_venue_city_state', plans)
+        plans = self.query_plans(lambda: self.client().get('/venues/{}'.format(venue_id)))
+        self.assertIn('ix_shows_venue_start_date', plans)
+        plans = self.query_plans(lambda: self.client().get('/artists/{}'.format(artist_id)))
+        self.assertIn('ix_shows_artist_start_date', plans)
+        plans = self.query_plans(reconcile_show_counts)
+        self.assertIn('ix_shows_venue_start_date', plans)
+        self.assertIn('ix_shows_artist_start_date', plans)
+        plans = self.query_plans(
+            lambda: self.client().post('/venues/search', data={'search_term': 'venue'}))
+        self.assertIn('venue_search' if db.engine.dialect.name == 'sqlite' else '_trgm', plans)
+
+    def test_seed_generates_reproducible_catalog(self):
+        import seed
+        venue_ids, artist_ids, added = seed.generate(venues=10, artists=20, shows=200, seed=3)
+        self.assertEqual((len(venue_ids), len(artist_ids)), (10, 20))
+        self.assertEqual(added, {'venues': 10, 'artists': 20, 'shows': Show.query.count()})
+        first = [(v.name, v.city, v.genres) for v in Venue.query.order_by(Venue.id)]
+        upcoming = sum(v.upcoming_shows_count for v in Venue.query)
+        self.assertEqual(upcoming, Show.query.filter(Show.start_date > datetime.now()).count())
+        db.drop_all()
+        db.create_all()
+        seed.generate(venues=10, artists=20, shows=200, seed=3)
+        self.assertEqual([(v.name, v.city, v.genres) for v in Venue.query.order_by(Venue.id)], first)
+        # seed-data reports the shows it made, not the ones asked for
+        shows = Show.query.count()
+        result = app.test_cli_runner().invoke(args=['seed-data', '--venues', '0', '--artists', '0',
+                                                    '--shows', '5000'])
+        db.session.remove()
+        added = Show.query.count() - shows
+        self.assertLess(added, 5000)
+        self.assertIn('Added 0 venues, 0 artists and {} shows.'.format(added), result.output)
+
+    def test_pool_stats(self):
+        self.client().get('/venues')
+        stats = self.client().get('/pool/stats').get_json()
+        self.assertGreater(stats['checkouts'], 0)
+        self.assertEqual(stats['checkouts'] - stats['checkins'], 0)
+
+    def test_timed_pool_records_waits_and_timeouts(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.exc import TimeoutError
+        from pooling import TimedQueuePool, pool_stats, engine_options
+        self.assertEqual(engine_options('sqlite://', 5, 10, 30, 1800, True), {})
+        # the engine options follow a config subclass's settings
+        from config import Config
+
+        class PostgresConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'postgresql://localhost/fyyur_test'
+            DB_POOL_SIZE = 2
+
+        class SqliteConfig(PostgresConfig):
+            SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+        options = create_app(PostgresConfig).config['SQLALCHEMY_ENGINE_OPTIONS']
+        self.assertEqual((options['poolclass'], options['pool_size']), (TimedQueuePool, 2))
+        self.assertEqual(create_app(SqliteConfig).config['SQLALCHEMY_ENGINE_OPTIONS'], {})
+        pool_stats.reset()
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine('sqlite:///' + os.path.join(tmp, 'pool.db'),
+                                   poolclass=TimedQueuePool, pool_size=1,
+                                   max_overflow=0, pool_timeout=0.05)
+            held = engine.connect()
+            with self.assertRaises(TimeoutError):
+                engine.connect()
+            held.close()
+            engine.dispose()
+        stats = pool_stats.stats(engine.pool)
+        self.assertEqual((stats['timeouts'], stats['size']), (1, 1))
+        self.assertGreaterEqual(stats['max_wait_ms'], 50)
+
+    def test_metrics_per_route(self):
+        from metrics import request_metrics
+        request_metrics.reset()
+        self.add_catalog(2)
+        venue_id = Venue.query.first().id
+        self.client().get('/venues')
+        self.client().get('/venues/{}'.format(venue_id)).data
+        self.client().get('/shows').data
+        routes = self.client().get('/metrics').get_json()['routes']
+        self.assertEqual(routes['GET /venues']['count'], 1)
+        self.assertEqual(routes['GET /venues']['avg_statements'], 2)
+        self.assertEqual(routes['GET /venues/<int:venue_id>']['max_statements'], 2)
+        self.assertEqual(routes['GET /shows']['avg_statements'], 1)
+
+    def test_slow_requests_are_logged_with_statements(self):
+        from metrics import request_metrics
+        request_metrics.reset()
+        app.config['SLOW_REQUEST_STATEMENTS'] = 0
+        try:
+            with self.assertLogs('fyyur.slow', level='WARNING') as logs:
+                self.client().get('/venues')
+        finally:
+            app.config['SLOW_REQUEST_STATEMENTS'] = 20
+        self.assertIn('FROM "VenueDirectory"', logs.output[0])
+        slow = request_metrics.summary()['slow_requests']
+        self.assertEqual(slow[0]['route'], 'GET /venues')
+        self.assertEqual(len(slow[0]['statements']), 2)
+
+    def test_logging_is_queued_as_json(self):
+        import json
+        import logging
+        from flask import Flask
+        from logs import configure_logging
+
+        class Collect(logging.Handler):
+            def __init__(self):
+                logging.Handler.__init__(self)
+                self.lines = list()
+
+            def emit(self, record):
+                self.lines.append(self.format(record))
+
+        log_app = Flask('log_test')
+
+        @log_app.route('/things/<int:thing_id>')
+        def thing(thing_id):
+            log_app.logger.warning('looking at %s', thing_id)
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                log_app.logger.exception('failed on %s', thing_id)
+            return 'ok'
+
+        collect = Collect()
+        listener = configure_logging(log_app, collect)
+        res = log_app.test_client().get('/things/7', headers={'X-Request-ID': 'abc'})
+        listener.stop()
+        atexit.unregister(listener.stop)
+        self.assertEqual(res.headers['X-Request-ID'], 'abc')
+        records = [json.loads(line) for line in collect.lines]
+        self.assertEqual(records[0]['message'], 'looking at 7')
+        self.assertEqual(records[0]['route'], '/things/<int:thing_id>')
+        self.assertEqual(records[0]['request_id'], 'abc')
+        self.assertEqual(records[1]['message'], 'failed on 7')
+        self.assertIn('ZeroDivisionError', records[1]['exception'])
+        self.assertEqual(records[2]['logger'], 'fyyur.access')
+        self.assertEqual(log_app.extensions['fyyur_logs'].dropped, 0)
+        logging.getLogger('fyyur').handlers.clear()
+
+    def test_api_venue_conditional_get(self):
+        self.add_catalog(1)
+        venue_id = Venue.query.first().id
+        res = self.client().get('/api/venues/{}'.format(venue_id))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['upcoming_shows_count'], 2)
+        etag = res.headers['ETag']
+        with self.count_queries() as statements:
+            res = self.client().get('/api/venues/{}'.format(venue_id),
+                                    headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(len(statements), 1)
+        Venue.query.get(venue_id).name = 'Renamed'
+        db.session.commit()
+        res = self.client().get('/api/venues/{}'.format(venue_id),
+                                headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['name'], 'Renamed')
+        self.assertNotEqual(res.headers['ETag'], etag)
+
+    def test_api_etags_follow_artist_and_counter_changes(self):
+        self.add_catalog(1)
+        artist_id = Artist.query.first().id
+        etag = self.client().get('/api/artists/{}'.format(artist_id)).headers['ETag']
+        reconcile_show_counts()
+        res = self.client().get('/api/artists/{}'.format(artist_id),
+                                headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        Venue.query.first().name = 'Renamed'
+        db.session.commit()
+        res = self.client().get('/api/artists/{}'.format(artist_id),
+                                headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['past_shows'][0]['venue_name'], 'Renamed')
+        self.assertEqual(self.client().get('/api/artists/1000').status_code, 404)
+
+    def test_api_shows_pages(self):
+        self.add_catalog(2)
+        res = self.client().get('/api/shows?limit=4')
+        data = res.get_json()
+        self.assertEqual(len(data['shows']), 4)
+        res = self.client().get('/api/shows?limit=4', headers={'If-None-Match': res.headers['ETag']})
+        self.assertEqual(res.status_code, 304)
+        rest = self.client().get('/api/shows?after={}'.format(data['next'])).get_json()
+        self.assertEqual((len(rest['shows']), rest['next']), (2, None))
+
+    def test_genre_filters_and_facets(self):
+        for name, genres in (('Jazz Club', ['Jazz']), ('Blues Bar', ['Blues']),
+                             ('Jazz Blues Hall', ['Jazz', 'Blues']), ('Punk Room', ['Punk'])):
+            db.session.add(Venue(name=name, city='Austin', state='TX', genres=genres))
+            db.session.add(Artist(name=name, genres=genres))
+        db.session.commit()
+        from facets import sync_genre_counts
+        sync_genre_counts()
+        db.session.commit()
+        res = self.client().get('/venues?genre=jazz&genre=Blues')
+        self.assertIn(b'Jazz Club', res.data)
+        self.assertIn(b'Blues Bar', res.data)
+        self.assertNotIn(b'Punk Room', res.data)
+        res = self.client().get('/venues?genre=Jazz&genre=Blues&match=all')
+        self.assertIn(b'Jazz Blues Hall', res.data)
+        self.assertNotIn(b'Jazz Club', res.data)
+        res = self.client().get('/artists?genre=Punk')
+        self.assertIn(b'Punk Room', res.data)
+        self.assertNotIn(b'Jazz Club', res.data)
+
+        from facets import genre_facets
+        facets = {f['genre']: f['count'] for f in genre_facets(Venue)}
+        self.assertEqual(facets, {'Jazz': 2, 'Blues': 2, 'Punk': 1})
+        facets = genre_facets(Venue, ['Jazz'])
+        self.assertEqual([(f['genre'], f['count'], f['selected']) for f in facets],
+                         [('Jazz', 2, True), ('Blues', 1, False)])
+        self.assertEqual(facets[1]['toggle'], ['Jazz', 'Blues'])
+
+    def test_genre_counts_follow_writes(self):
+        from facets import genre_facets, sync_genre_counts
+        form = {'name': 'Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+                'phone': '512-555-0100', 'genres': ['Jazz', 'Blues'], 'image_link': '',
+                'facebook_link': '', 'website_link': '', 'seeking_description': ''}
+        self.client().post('/venues/create', data=form)
+        self.client().post('/venues/create', data=dict(form, name='Club', genres=['Jazz']))
+        venue_id = Venue.query.filter_by(name='Hall').one().id
+        self.client().post('/venues/{}/edit'.format(venue_id),
+                           data=dict(form, genres=['Jazz', 'Punk'], version=1))
+        facets = {f['genre']: f['count'] for f in genre_facets(Venue)}
+        self.assertEqual(facets, {'Jazz': 2, 'Punk': 1})
+        self.client().delete('/venues/{}'.format(venue_id))
+        with self.count_queries() as statements:
+            facets = {f['genre']: f['count'] for f in genre_facets(Venue)}
+        self.assertEqual(facets, {'Jazz': 1})
+        self.assertIn('FROM "GenreCount"', statements[0])
+        self.assertEqual(sync_genre_counts(), 0)
+
+    def test_booking_rejects_overlapping_shows(self):
+        venues = [Venue(name='Venue A'), Venue(name='Venue B')]
+        artists = [Artist(name='Artist X'), Artist(name='Artist Y')]
+        db.session.add_all(venues + artists)
+        db.session.commit()
+        a, b = [venue.id for venue in venues]
+        x, y = [artist.id for artist in artists]
+        start = datetime.now().replace(microsecond=0) + timedelta(days=1)
+
+        def book(artist_id, venue_id, minutes_later, duration=120):
+            return self.client().post('/shows/create', data={
+                'artist_id': artist_id,
+                'venue_id': venue_id,
+                'start_time': (start + timedelta(minutes=minutes_later)).strftime('%Y-%m-%d %H:%M:%S'),
+                'duration': duration
+            })
+
+        self.assertIn(b'successfully listed', book(x, a, 0).data)
+        self.assertIn(b'artist is already booked', book(x, b, 60).data)
+        self.assertIn(b'venue is already booked', book(y, a, 119).data)
+        self.assertIn(b'venue is already booked', book(y, a, -30, 60).data)
+        for duration in (0, 24 * 60 + 1, 'long'):
+            self.assertIn(b'duration', book(y, b, 600, duration).data)
+        with self.count_queries() as statements:
+            self.assertIn(b'successfully listed', book(y, a, 120).data)
+        self.assertFalse([s for s in statements if s.startswith('SELECT') and 'FROM "Shows"' in s])
+        self.assertEqual(Show.query.count(), 2)
+        self.assertEqual(Show.query.filter_by(artist_id=y).one().duration, 120)
+
+    def test_timeline_overlaps_with_overlapping_history(self):
+        from booking import Timeline
+        day = datetime(2030, 1, 1)
+        hours = lambda start, end: (day + timedelta(hours=start), day + timedelta(hours=end))
+        # an old double booking: a long show covering a short one
+        timeline = Timeline([hours(1, 10), hours(2, 3)])
+        self.assertTrue(timeline.overlaps(*hours(5, 6)))
+        self.assertFalse(timeline.overlaps(*hours(10, 11)))
+        timeline.add(*hours(12, 20))
+        timeline.add(*hours(11, 12))
+        self.assertTrue(timeline.overlaps(*hours(15, 16)))
+        self.assertFalse(timeline.overlaps(*hours(0, 1)))
+        self.assertEqual(len(timeline), 4)
+
+    def test_venue_directory_follows_writes(self):
+        from directory import read_directory, stale_areas, sync_directory
+        self.add_catalog(2, cities=1)
+        self.assertEqual(read_directory(), [{'city': 'City 0', 'state': 'CA', 'venues': [
+            {'id': 1, 'name': 'Venue 0', 'num_upcoming_shows': 2},
+            {'id': 2, 'name': 'Venue 1', 'num_upcoming_shows': 2}]}])
+        form = {'name': 'Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+                'phone': '512-555-0100', 'genres': 'Jazz', 'image_link': '',
+                'facebook_link': '', 'website_link': '', 'seeking_description': ''}
+        self.client().post('/venues/create', data=form)
+        self.assertIn(b'Hall', self.client().get('/venues').data)
+        self.client().post('/venues/1/edit', data=dict(form, name='Moved', city='Austin', version=1))
+        self.client().delete('/venues/2')
+        self.client().post('/shows/create', data={
+            'artist_id': 1, 'venue_id': 3,
+            'start_time': (datetime.now() + timedelta(days=5)).strftime('%Y-%m-%d %H:%M:%S')})
+        self.assertEqual(read_directory(), [{'city': 'Austin', 'state': 'TX', 'venues': [
+            {'id': 1, 'name': 'Moved', 'num_upcoming_shows': 2},
+            {'id': 3, 'name': 'Hall', 'num_upcoming_shows': 1}]}])
+        self.assertEqual(stale_areas(), set())
+
+        # shows starting, or writes behind the directory's back, are caught up
+        Show.query.filter(Show.venue_id == 1).update({'start_date': datetime.now() - timedelta(days=1)})
+        Venue.query.filter(Venue.id == 3).update({'name': 'Renamed'})
+        db.session.commit()
+        self.assertEqual(stale_areas(), {('Austin', 'TX')})
+        reconcile_show_counts()
+        self.assertEqual(stale_areas(), set())
+        self.assertEqual([v['num_upcoming_shows'] for v in read_directory()[0]['venues']], [0, 1])
+        self.assertEqual(sync_directory(), 0)
+
+        # on Postgres a refresh locks each area first
+        from sqlalchemy.dialects import postgresql
+        from directory import area_lock
+        sql = str(area_lock('Austin', 'TX').compile(dialect=postgresql.dialect(),
+                                                    compile_kwargs={'literal_binds': True}))
+        self.assertIn("pg_advisory_xact_lock(hashtext('VenueDirectory/Austin/TX'))", sql)
+
+    def test_typeahead_follows_writes(self):
+        for name in ('The Musical Hop', 'Park Square Live Music & Coffee', 'The Dueling Pianos Bar'):
+            db.session.add(Venue(name=name, city='San Francisco', state='CA'))
+        db.session.add(Artist(name='Guns N Petals'))
+        db.session.commit()
+        res = self.client().get('/api/typeahead/venues?q=mus')
+        self.assertEqual([v['name'] for v in res.get_json()['data']],
+                         ['Park Square Live Music & Coffee', 'The Musical Hop'])
+        res = self.client().get('/api/typeahead/venues?q=the%20d&limit=1')
+        self.assertEqual(res.get_json()['data'], [{'id': 3, 'name': 'The Dueling Pianos Bar'}])
+        self.assertEqual(self.client().get('/api/typeahead/shows?q=a').status_code, 404)
+        res = self.client().get('/api/typeahead/artists?q=gun')
+        self.assertEqual(res.get_json()['data'], [{'id': 1, 'name': 'Guns N Petals'}])
+
+        form = {'name': 'Matt Quevado', 'city': 'New York', 'state': 'NY', 'phone': '300-400-5000',
+                'genres': 'Jazz', 'image_link': '', 'facebook_link': '', 'website_link': '',
+                'seeking_description': ''}
+        self.client().post('/artists/create', data=form)
+        self.client().post('/artists/1/edit', data=dict(form, name='The Wild Sax Band', version=1))
+        self.client().delete('/venues/1')
+        with self.count_queries() as statements:
+            artists = self.client().get('/api/typeahead/artists?q=').get_json()['data']
+            self.assertEqual(artists, [])
+            artists = self.client().get('/api/typeahead/artists?q=Ma').get_json()['data']
+            self.assertEqual(artists, [{'id': 2, 'name': 'Matt Quevado'}])
+            self.assertEqual(self.client().get('/api/typeahead/artists?q=gun').get_json()['data'], [])
+            self.assertEqual(self.client().get('/api/typeahead/artists?q=sax').get_json()['data'],
+                             [{'id': 1, 'name': 'The Wild Sax Band'}])
+            venues = self.client().get('/api/typeahead/venues?q=mus').get_json()['data']
+            self.assertEqual([v['id'] for v in venues], [2])
+        self.assertEqual(statements, [])
+
+    def test_edit_updates_changed_columns_with_version_check(self):
+        venue = Venue(name='Hall', city='Austin', state='TX', address='1 Main St',
+                      phone='512-555-0100', genres=['Jazz'], image_link='', facebook_link='',
+                      website_link='', seeking_talent=False, talent_description='')
+        db.session.add(venue)
+        db.session.commit()
+        venue_id = venue.id
+        self.assertIn(b'name="version" type="hidden" value="1"',
+                      self.client().get('/venues/{}/edit'.format(venue_id)).data)
+        form = {'name': 'Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+                'phone': '512-555-0100', 'genres': 'Jazz', 'image_link': '',
+                'facebook_link': '', 'website_link': '', 'seeking_description': '',
+                'version': 1}
+
+        with self.count_queries() as statements:
+            self.client().post('/venues/{}/edit'.format(venue_id), data=form)
+        self.assertFalse([s for s in statements if s.startswith('UPDATE')])
+
+        with self.count_queries() as statements:
+            self.client().post('/venues/{}/edit'.format(venue_id), data=dict(form, name='Big Hall'))
+        updates = [s for s in statements if s.startswith('UPDATE "Venue"')]
+        self.assertEqual(len(updates), 1)
+        assignments = updates[0].split(' SET ')[1].split(' WHERE ')[0]
+        self.assertEqual(sorted(a.split('=')[0].strip() for a in assignments.split(',')),
+                         ['name', 'updated_at', 'version'])
+
+        # a second editor still holding version 1 does not overwrite the rename
+        res = self.client().post('/venues/{}/edit'.format(venue_id),
+                                 data=dict(form, phone='512-555-0199'), follow_redirects=True)
+        self.assertIn(b'changed by someone else', res.data)
+        db.session.expire_all()
+        venue = Venue.query.get(venue_id)
+        self.assertEqual((venue.name, venue.phone, venue.version), ('Big Hall', '512-555-0100', 2))
+        self.client().post('/venues/{}/edit'.format(venue_id),
+                           data=dict(form, name='Big Hall', phone='512-555-0199', version=2))
+        db.session.expire_all()
+        self.assertEqual(Venue.query.get(venue_id).version, 3)
+        # neither does a submission without a usable version
+        for version in (None, 'x'):
+            data = dict(form, name='Old Hall', version=version)
+            if version is None:
+                del data['version']
+            res = self.client().post('/venues/{}/edit'.format(venue_id), data=data, follow_redirects=True)
+            self.assertIn(b'The form was out of date', res.data)
+            self.assertNotIn(b'changed by someone else', res.data)
+        db.session.expire_all()
+        self.assertEqual(Venue.query.get(venue_id).name, 'Big Hall')
+        self.assertEqual(self.client().post('/venues/999/edit', data=form).status_code, 404)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+#----------------------------------------------------------------------------#
+# Typeahead.
+#
+# The show form looks up artists and venues by name as the user types. Each
+# kind has a NameIndex: every word-start suffix of every name, lower-cased,
+# in one sorted list, so the matches for a prefix are a contiguous run found
+# with one bisect ("mus" finds "The Musical Hop"). Indexes are loaded from
+# the database on first use and kept current by the create, edit and delete
+# handlers. Like the page cache they live in this process only; with several
+# workers an index is reloaded once it is older than TYPEAHEAD_TTL.
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+from bisect import bisect_left, insort
+from models import db, Venue, Artist
+
+KINDS = {
+  'artists': Artist,
+  'venues': Venue,
+}
+LIMIT = 10
+MAX_LIMIT = 50
+
+
+def _keys(name):
+  # the name from each word on: "the musical hop", "musical hop", "hop"
+  folded = ' '.join((name or '').lower().split())
+  keys = [folded[start:] for start in range(len(folded))
+          if start == 0 or folded[start - 1] == ' ']
+  return [key for key in keys if key]
+
+
+class NameIndex(object):
+
+  def __init__(self, rows=()):
+    self.names = dict()
+    self.keys = list()
+    for id, name in rows:
+      self.names[id] = name
+      self.keys.extend((key, id) for key in _keys(name))
+    self.keys.sort()
+
+  def __len__(self):
+    return len(self.names)
+
+  def put(self, id, name):
+    self.discard(id)
+    self.names[id] = name
+    for key in _keys(name):
+      insort(self.keys, (key, id))
+
+  def discard(self, id):
+    name = self.names.pop(id, None)
+    if name is None:
+      return
+    for key in _keys(name):
+      position = bisect_left(self.keys, (key, id))
+      if position < len(self.keys) and self.keys[position] == (key, id):
+        del self.keys[position]
+
+  def match(self, prefix, limit=LIMIT):
+    # up to `limit` {id, name} whose name has a word starting with `prefix`
+    prefix = ' '.join(prefix.lower().split())
+    if not prefix:
+      return []
+    found = list()
+    seen = set()
+    position = bisect_left(self.keys, (prefix,))
+    while position < len(self.keys) and len(found) < limit:
+      key, id = self.keys[position]
+      if not key.startswith(prefix):
+        break
+      if id not in seen:
+        seen.add(id)
+        found.append({"id": id, "name": self.names[id]})
+      position += 1
+    return found
+
+
+class Typeahead(object):
+
+  def __init__(self, ttl=300):
+    self.ttl = ttl
+    self._lock = threading.Lock()
+    self._indexes = dict()
+
+  def init_app(self, app):
+    self.ttl = app.config.get('TYPEAHEAD_TTL', self.ttl)
+
+  def _index(self, kind):
+    # callers hold the lock
+    loaded = self._indexes.get(kind)
+    if loaded is None or loaded[0] < time.monotonic():
+      model = KINDS[kind]
+      index = NameIndex(db.session.query(model.id, model.name))
+      loaded = (time.monotonic() + self.ttl, index)
+      self._indexes[kind] = loaded
+    return loaded[1]
+
+  def match(self, kind, prefix, limit=None):
+    # None for an unknown kind
+    if kind not in KINDS:
+      return None
+    limit = min(limit or LIMIT, MAX_LIMIT)
+    with self._lock:
+      return self._index(kind).match(prefix, limit)
+
+  def put(self, kind, id, name):
+    # call after the commit that created or renamed the row
+    with self._lock:
+      if kind in self._indexes:
+        self._indexes[kind][1].put(id, name)
+
+  def discard(self, kind, id):
+    with self._lock:
+      if kind in self._indexes:
+        self._indexes[kind][1].discard(id)
+
+  def clear(self):
+    with self._lock:
+      self._indexes.clear()
+
+
+typeahead = Typeahead()
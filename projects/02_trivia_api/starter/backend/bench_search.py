@@ -0,0 +1,117 @@
+"""Time question searches over N questions.
+
+Fills an in-memory SQLite database (or DATABASE_URL) with generated
+questions and reports p50/p95 per search for the original approach
+(ILIKE, load every match, format them, slice a page), the same ILIKE
+with LIMIT and COUNT(*) in SQL, and question_search (see search.py),
+for words from common to rare, a short prefix and two words:
+
+    python bench_search.py --questions 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from sqlalchemy import func
+
+from flaskr import create_app, QUESTIONS_PER_PAGE
+from models import db, Question
+from search import question_search
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa',
+             'do', 'gri', 'fen', 'tor', 'bel', 'quin']
+
+
+def vocabulary(rng, size):
+    # distinct made-up words, "kalo17"
+    return [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+            + str(i) for i in range(size)]
+
+
+def sentence(rng, words, length):
+    # Zipf-like: a few words are very common, most are rare
+    return ' '.join(words[int(len(words) ** rng.random()) - 1]
+                    for _ in range(length))
+
+
+def timed_ms(fn, runs):
+    latencies = list()
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        latencies.append(1000 * (time.perf_counter() - started))
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(0.95 * (len(latencies) - 1))]
+
+
+def original(term):
+    selection = Question.query.filter(
+        Question.question.ilike('%{}%'.format(term))).all()
+    return [question.format() for question in selection][:QUESTIONS_PER_PAGE]
+
+
+def sql_ilike(term):
+    criterion = Question.question.ilike('%{}%'.format(term))
+    db.session.query(func.count(Question.id)).filter(criterion).scalar()
+    return Question.query.filter(criterion).order_by(Question.id).limit(
+        QUESTIONS_PER_PAGE).all()
+
+
+def indexed(term):
+    return question_search.search(term, limit=QUESTIONS_PER_PAGE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=100000)
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    words = vocabulary(rng, args.words)
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        db.session.bulk_insert_mappings(Question, [{
+            'question': sentence(rng, words, rng.randint(5, 12)) + '?',
+            'answer': sentence(rng, words, rng.randint(1, 3)),
+            'category': str(rng.randint(1, 6)),
+            'difficulty': rng.randint(1, 5),
+        } for _ in range(args.questions)])
+        db.session.commit()
+        print('inserted {} questions in {:.0f}ms'.format(
+            args.questions, 1000 * (time.perf_counter() - started)))
+
+        question_search.clear()
+        started = time.perf_counter()
+        question_search.search(words[0])
+        print('built the search index in {:.0f}ms'.format(
+            1000 * (time.perf_counter() - started)))
+
+        terms = {
+            'common word': words[0],
+            'word': words[100],
+            'rare word': words[len(words) // 2],
+            'prefix': words[3][:3],
+            'two words': '{} {}'.format(words[1], words[20]),
+        }
+        print()
+        print('{:<14} {:>8} {:>22} {:>22} {:>22}'.format(
+            'search', 'matches', 'original p50/p95 ms',
+            'sql ilike p50/p95 ms', 'indexed p50/p95 ms'))
+        for label, term in terms.items():
+            matches = question_search.search(term)[0]
+            timings = [timed_ms(lambda: fn(term), args.runs)
+                       for fn in (original, sql_ilike, indexed)]
+            print('{:<14} {:>8} {}'.format(label, matches, ' '.join(
+                '{:>22}'.format('{:.2f} / {:.2f}'.format(*timing))
+                for timing in timings)))
+
+
+if __name__ == '__main__':
+    main()
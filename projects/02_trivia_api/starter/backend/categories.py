@@ -0,0 +1,67 @@
+import hashlib
+import json
+import threading
+from flask import Response
+
+from models import Category, on_change
+
+'''
+Category registry
+
+The categories hardly ever change, so they are read once when
+the app is created and kept in memory with their JSON already
+encoded: responses that list them splice that fragment in
+instead of querying and serializing them again. The version is
+a digest of the fragment, the same in every worker holding the
+same categories, and is sent as the ETag of /categories.
+
+The registry reloads when a category is inserted, updated or
+deleted in this process, or on POST /categories/reload; other
+workers keep their copy until they are reloaded or restarted.
+'''
+
+
+class CategoryRegistry(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.categories = dict()
+        self.fragment = '{}'
+        self.version = None
+
+    def load(self):
+        categories = {str(category.id): category.type
+                      for category in Category.query.order_by(Category.id)}
+        fragment = json.dumps(categories, separators=(',', ':'))
+        with self._lock:
+            self.categories = categories
+            self.fragment = fragment
+            self.version = hashlib.sha1(
+                fragment.encode('utf-8')).hexdigest()[:16]
+        return self.version
+
+    def __len__(self):
+        return len(self.categories)
+
+    def response(self, payload, status=200):
+        '''
+        payload as a JSON response with the categories added
+        under 'categories'
+        '''
+        with self._lock:
+            fragment, version = self.fragment, self.version
+        body = json.dumps(payload)
+        body = '{"categories":' + fragment + (
+            ',' + body[1:] if len(body) > 2 else '}')
+        response = Response(body, status=status, mimetype='application/json')
+        response.headers['X-Categories-Version'] = version
+        return response
+
+
+category_registry = CategoryRegistry()
+
+
+@on_change
+def reload_categories(row, change):
+    if isinstance(row, Category):
+        category_registry.load()
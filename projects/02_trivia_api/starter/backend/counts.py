@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import func
+
+from models import db, Question, on_change
+
+'''
+Question counts
+
+The totalQuestions of a response is a COUNT(*) in the database:
+over the whole table, per category (all categories in one
+GROUP BY) or over the questions matching some criterion,
+such as a search.
+Answers are kept in memory until a question is inserted,
+updated or deleted in this process, or for at most `ttl`
+seconds, which bounds how long another worker's changes
+take to show.
+'''
+
+SEARCHES = 256
+
+
+class QuestionCounts(object):
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._expires = time.monotonic() + self.ttl
+        self._total = None
+        self._categories = None
+        self._searches = OrderedDict()
+
+    def _fresh(self):
+        # callers hold the lock
+        if self._expires < time.monotonic():
+            self._reset()
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def total(self):
+        with self._lock:
+            self._fresh()
+            if self._total is None:
+                self._total = db.session.query(
+                    func.count(Question.id)).scalar()
+            return self._total
+
+    def category(self, category_id):
+        with self._lock:
+            self._fresh()
+            if self._categories is None:
+                self._categories = dict(db.session.query(
+                    Question.category, func.count(Question.id)).group_by(
+                    Question.category))
+            return self._categories.get(str(category_id), 0)
+
+    def matching(self, key, criterion):
+        '''
+        the number of questions matching the SQL `criterion`,
+        cached under the hashable `key` that identifies it
+        '''
+        with self._lock:
+            self._fresh()
+            if key in self._searches:
+                self._searches.move_to_end(key)
+                return self._searches[key]
+            count = db.session.query(func.count(Question.id)).filter(
+                criterion).scalar()
+            self._searches[key] = count
+            if len(self._searches) > SEARCHES:
+                self._searches.popitem(last=False)
+            return count
+
+
+question_counts = QuestionCounts()
+
+
+@on_change
+def forget_counts(row, change):
+    if isinstance(row, Question):
+        question_counts.clear()
@@ -2,27 +2,51 @@ import os
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import random
 
-from models import setup_db, Question, Category
+from models import setup_db, Question
+from counts import question_counts
+from search import question_search
+from categories import category_registry
+from quizzes import quizzes, SessionExpired
 
 QUESTIONS_PER_PAGE = 10
 
 
-def paginate_questions(request, selection):
+def current_page(request):
     page = request.args.get('page', 1, type=int)
-    start = (page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
+    if page < 1:
+        abort(400)
+    return page
+
+
+def paginate_questions(request, selection):
+    '''
+    One page of the questions matched by the query `selection`,
+    in id order. The page is cut out by the database, so only the
+    rows returned are loaded: ?page=<n> is an OFFSET, and
+    ?after_id=<id> starts right after the given question instead,
+    which stays cheap however deep the page is.
+    '''
+    page = current_page(request)
+    after_id = request.args.get('after_id', None, type=int)
+    if after_id is not None and after_id < 0:
+        abort(400)
 
-    questions = [question.format() for question in selection]
-    current_question = questions[start:end]
-    return current_question
+    selection = selection.order_by(Question.id)
+    if after_id is not None:
+        selection = selection.filter(Question.id > after_id)
+    else:
+        selection = selection.offset((page - 1) * QUESTIONS_PER_PAGE)
+    questions = selection.limit(QUESTIONS_PER_PAGE).all()
+    return [question.format() for question in questions]
 
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
     setup_db(app)
+    category_registry.load()
+    question_search.setup()
     CORS(app)
 
     @app.after_request
@@ -38,15 +62,21 @@ def create_app(test_config=None):
     '''
     @app.route('/categories')
     def get_all_categories():
-        categories = Category.query.all()
-        if len(categories) == 0:
+        if len(category_registry) == 0:
             abort(404)
-        categories_dict = dict()
-        for category in categories:
-            categories_dict[category.id] = category.type
+        response = category_registry.response({'success': True})
+        response.set_etag(category_registry.version)
+        return response.make_conditional(request)
+
+    '''
+    Reload the categories from the database,
+    after they were changed outside this app.
+    '''
+    @app.route('/categories/reload', methods=['POST'])
+    def reload_categories():
         return jsonify({
             'success': True,
-            'categories': categories_dict
+            'version': category_registry.load()
         }), 200
     '''
     At this point, when you start the application
@@ -57,20 +87,14 @@ def create_app(test_config=None):
     '''
     @app.route('/questions')
     def get_questions():
-        selection = Question.query.order_by(Question.id).all()
-        current_questions = paginate_questions(request, selection)
+        current_questions = paginate_questions(request, Question.query)
         if len(current_questions) == 0:
             abort(404)
-        categories = Category.query.all()
-        categories_dict = dict()
-        for category in categories:
-            categories_dict[category.id] = category.type
-        return jsonify({
+        return category_registry.response({
             'success': True,
             'questions': current_questions,
-            'totalQuestions': len(Question.query.all()),
-            'categories': categories_dict
-        }), 200
+            'totalQuestions': question_counts.total()
+        })
     '''
     Create an endpoint to DELETE question using a question ID.
     '''
@@ -110,6 +134,11 @@ def create_app(test_config=None):
     Create a POST endpoint to get questions based on a search term.
     It should return any questions for whom the search term
     is a substring of the question.
+    Each word of the search term has to start a word of the
+    question or its answer; the matches are ranked by relevance
+    and can be narrowed to a category and a difficulty. Results
+    are paged with page only: a ranking has no id order for
+    after_id to continue from.
     '''
     @app.route('/questions/search', methods=['POST'])
     def search_question():
@@ -117,13 +146,23 @@ def create_app(test_config=None):
         search_key = data.get('searchTerm', None)
         if not search_key:
             abort(404)
-        selection = Question.query.filter(
-            Question.question.ilike('%{}%'.format(search_key))).all()
-        current_questions = paginate_questions(request, selection)
+        if 'after_id' in request.args:
+            abort(400)
+        page = current_page(request)
+        try:
+            category = data.get('category')
+            category = None if category is None else int(category)
+            difficulty = data.get('difficulty')
+            difficulty = None if difficulty is None else int(difficulty)
+        except (TypeError, ValueError):
+            abort(422)
+        total_questions, questions = question_search.search(
+            search_key, category, difficulty,
+            (page - 1) * QUESTIONS_PER_PAGE, QUESTIONS_PER_PAGE)
         return jsonify({
             'success': True,
-            'questions': current_questions,
-            'totalQuestions': len(Question.query.all())
+            'questions': [question.format() for question in questions],
+            'totalQuestions': total_questions
         }), 200
 
     '''
@@ -131,14 +170,15 @@ def create_app(test_config=None):
     '''
     @app.route('/categories/<int:category_id>/questions', methods=['GET'])
     def get_questions_by_category(category_id):
-        selection = Question.query.filter_by(category=str(category_id)).all()
-        if len(selection) == 0:
+        total_questions = question_counts.category(category_id)
+        if total_questions == 0:
             abort(404)
+        selection = Question.query.filter_by(category=str(category_id))
         current_questions = paginate_questions(request, selection)
         return jsonify({
             'success': True,
             'questions': current_questions,
-            'totalQuestions': len(Question.query.all()),
+            'totalQuestions': total_questions,
             'currentCategory': category_id
         }), 200
 
@@ -147,31 +187,39 @@ def create_app(test_config=None):
     This endpoint should take category and previous question parameters
     and return a random questions within the given category,
     if provided, and that is not one of the previous questions.
+    The quiz_session token of the response, sent back with the next
+    round, lets the server remember the questions already asked;
+    previous_questions can then be left out. If the session has
+    expired meanwhile, the answer is 410 and the client starts
+    again with its previous_questions.
     '''
     @app.route('/quizzes', methods=['POST'])
     def play_quiz():
+        data = request.get_json()
+        if data is None:
+            abort(422)
+        previous_questions = data.get('previous_questions')
+        quiz_category = data.get('quiz_category')
+        token = data.get('quiz_session')
+        if quiz_category is None or (previous_questions is None and
+                                     not token):
+            abort(422)
         try:
-            data = request.get_json()
-            previous_questions = data.get('previous_questions')
-            quiz_category = data.get('quiz_category')
-            if quiz_category is None or previous_questions is None:
-                abort(422)
-            current_questions = None
-            if quiz_category['id'] == 0:
-                current_questions = Question.query.filter(
-                    ~Question.id.in_(previous_questions)).all()
-            else:
-                current_questions = Question.query.filter_by(
-                    category=quiz_category['id']).filter(
-                    ~Question.id.in_(previous_questions)).all()
-            random_question = current_questions[random.randint(
-                0, len(current_questions)-1)] if len(current_questions) > 0 else None
-            return jsonify({
-                'success': True,
-                'question': random_question.format()
-            }), 200
-        except:
+            category = str(quiz_category['id'])
+            if previous_questions is not None:
+                previous_questions = {int(id) for id in previous_questions}
+        except (KeyError, TypeError, ValueError):
             abort(422)
+        try:
+            token, question = quizzes.draw(token, category,
+                                           previous_questions)
+        except SessionExpired:
+            abort(410)
+        return jsonify({
+            'success': True,
+            'quiz_session': token,
+            'question': question.format() if question else None
+        }), 200
     '''
     Create error handlers for all expected errors
     '''
@@ -191,6 +239,14 @@ def create_app(test_config=None):
             "message": "unprocessable"
         }), 422
 
+    @app.errorhandler(410)
+    def gone(error):
+        return jsonify({
+            "success": False,
+            "error": 410,
+            "message": "quiz session expired"
+        }), 410
+
     @app.errorhandler(400)
     def bad_request(error):
         return jsonify({
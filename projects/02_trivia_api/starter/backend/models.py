@@ -4,7 +4,8 @@ from flask_sqlalchemy import SQLAlchemy
 import json
 
 database_name = "trivia"
-database_path = "postgres://{}/{}".format('localhost:5432', database_name)
+database_path = os.environ.get(
+    'DATABASE_URL', "postgres://{}/{}".format('localhost:5432', database_name))
 db = SQLAlchemy()
 
 '''
@@ -18,6 +19,22 @@ def setup_db(app, database_path=database_path):
     db.init_app(app)
     db.create_all()
 
+'''
+on_change(listener)
+    registers listener(row, change), called after a question or
+    category is committed by insert(), update() or delete(); change
+    is 'insert', 'update' or 'delete'
+'''
+listeners = []
+
+def on_change(listener):
+    listeners.append(listener)
+    return listener
+
+def changed(row, change):
+    for listener in listeners:
+        listener(row, change)
+
 '''
 Question
 
@@ -40,13 +57,16 @@ class Question(db.Model):
   def insert(self):
     db.session.add(self)
     db.session.commit()
+    changed(self, 'insert')
   
   def update(self):
     db.session.commit()
+    changed(self, 'update')
 
   def delete(self):
     db.session.delete(self)
     db.session.commit()
+    changed(self, 'delete')
 
   def format(self):
     return {
@@ -70,6 +90,20 @@ class Category(db.Model):
   def __init__(self, type):
     self.type = type
 
+  def insert(self):
+    db.session.add(self)
+    db.session.commit()
+    changed(self, 'insert')
+
+  def update(self):
+    db.session.commit()
+    changed(self, 'update')
+
+  def delete(self):
+    db.session.delete(self)
+    db.session.commit()
+    changed(self, 'delete')
+
   def format(self):
     return {
       'id': self.id,
@@ -0,0 +1,147 @@
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from models import db, Question, on_change
+
+'''
+Quiz sessions
+
+A quiz draws questions from an in-memory pool: a tuple of the
+ids of a category's questions ('0' for all of them), loaded in
+one query and dropped when a question is inserted, updated or
+deleted, or after POOL_TTL seconds.
+
+Each quiz is a session, keyed by a random token the client sends
+back as quiz_session. The session draws without replacement with
+a Fisher-Yates shuffle done lazily over the shared pool: drawing
+picks a random slot among those not drawn yet and swaps the first
+of them into it, remembering only the swapped slots, so a draw is
+constant time and no session copies its pool. A question deleted
+since the pool was loaded is skipped when it can't be fetched.
+Sessions expire SESSION_TTL seconds after their last draw.
+
+A client sends previous_questions only to start a quiz. An
+unknown or expired token (or one held by another worker) starts
+a new session that skips them when they are sent, and raises
+SessionExpired when they are not, so the client can send them.
+'''
+
+POOL_TTL = 60
+SESSION_TTL = 30 * 60
+MAX_SESSIONS = 10000
+
+
+class SessionExpired(Exception):
+    pass
+
+
+class QuizSession(object):
+
+    def __init__(self, category, pool, seen=()):
+        self.category = category
+        self.pool = pool
+        self.drawn = 0
+        self.swapped = dict()
+        self.seen = set(seen)
+
+    def draw(self):
+        # a question id not drawn yet, or None once they all were
+        pool, swapped = self.pool, self.swapped
+        while self.drawn < len(pool):
+            slot = random.randrange(self.drawn, len(pool))
+            question_id = swapped.get(slot, pool[slot])
+            first = swapped.pop(self.drawn, pool[self.drawn])
+            if slot != self.drawn:
+                swapped[slot] = first
+            self.drawn += 1
+            if question_id not in self.seen:
+                self.seen.add(question_id)
+                return question_id
+        return None
+
+
+class Quizzes(object):
+
+    def __init__(self, pool_ttl=POOL_TTL, session_ttl=SESSION_TTL,
+                 max_sessions=MAX_SESSIONS):
+        self.pool_ttl = pool_ttl
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._pools = None
+        self._sessions = OrderedDict()
+
+    def _pool(self, category):
+        # callers hold the lock
+        if self._pools is None or self._pools[0] < time.monotonic():
+            pools = dict()
+            everything = list()
+            for question_id, question_category in db.session.query(
+                    Question.id, Question.category).order_by(Question.id):
+                pools.setdefault(str(question_category), []).append(
+                    question_id)
+                everything.append(question_id)
+            pools = {key: tuple(ids) for key, ids in pools.items()}
+            pools['0'] = tuple(everything)
+            self._pools = (time.monotonic() + self.pool_ttl, pools)
+        return self._pools[1].get(str(category), ())
+
+    def _expire(self, now):
+        # callers hold the lock; sessions are kept oldest use first
+        while self._sessions:
+            token, (expires, _) = next(iter(self._sessions.items()))
+            if expires >= now and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[token]
+
+    def session(self, token, category, previous_questions=None):
+        '''
+        (token, session) for the quiz `token`, or for a new quiz
+        over `category` if there is no such quiz over it; a new
+        quiz for a token needs the previous_questions
+        '''
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            found = self._sessions.pop(token, None) if token else None
+            if found is None or found[1].category != category:
+                if token and previous_questions is None:
+                    raise SessionExpired()
+                token = secrets.token_urlsafe(16)
+                session = QuizSession(category, self._pool(category),
+                                      previous_questions or ())
+            else:
+                session = found[1]
+            self._sessions[token] = (now + self.session_ttl, session)
+            return token, session
+
+    def draw(self, token, category, previous_questions=None):
+        '''
+        (token, question) with the next question of the quiz,
+        None once every question of its category was asked
+        '''
+        token, session = self.session(token, category, previous_questions)
+        while True:
+            with self._lock:
+                question_id = session.draw()
+            if question_id is None:
+                return token, None
+            question = Question.query.get(question_id)
+            if question is not None:
+                return token, question
+
+    def clear_pools(self):
+        with self._lock:
+            self._pools = None
+
+
+quizzes = Quizzes()
+
+
+@on_change
+def forget_pools(row, change):
+    if isinstance(row, Question):
+        quizzes.clear_pools()
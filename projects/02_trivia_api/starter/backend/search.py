@@ -0,0 +1,238 @@
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from sqlalchemy import and_, func, literal_column, text
+
+from models import db, Question, on_change
+from counts import question_counts
+
+'''
+Question search
+
+A search term is split into words, and a question matches when
+each word starts a word of its question or answer text ("pen"
+finds "Who discovered penicillin?"). Matches are ranked by
+relevance, question text weighing more than the answer, and
+can be narrowed to a category and a difficulty.
+
+On Postgres the text is searched with a tsvector expression,
+ranked with ts_rank and served by a GIN index on that expression,
+created by setup() if it is missing. Elsewhere (SQLite, tests)
+searches use an inverted index kept in this process: for every
+word, the ids of the questions containing it with their weighted
+counts, ranked with BM25. It is loaded on the first search and
+kept current by Question.insert(), update() and delete() in this
+process, so it is meant for a single process.
+
+The two differ on stop words: to_tsquery('english', ...) drops
+words such as "the", so a term made only of them matches nothing
+on Postgres, while the in-process index matches them like any
+other word. Querying with the 'simple' configuration would not
+help, as the indexed vector holds english stems.
+'''
+
+VECTOR = ("(setweight(to_tsvector('english', coalesce({0}question, '')), 'A')"
+          " || setweight(to_tsvector('english', coalesce({0}answer, '')), 'B'))")
+QUESTION_WEIGHT = 2
+ANSWER_WEIGHT = 1
+K1 = 1.2
+B = 0.75
+
+
+def words(search_term):
+    return re.findall(r'\w+', (search_term or '').lower())
+
+
+def _weights(question, answer):
+    # {word: weighted count} of a question's text
+    weights = dict()
+    for content, weight in ((question, QUESTION_WEIGHT),
+                            (answer, ANSWER_WEIGHT)):
+        for word in words(content):
+            weights[word] = weights.get(word, 0) + weight
+    return weights
+
+
+class SearchIndex(object):
+
+    def __init__(self, rows=()):
+        self.postings = dict()
+        self.questions = dict()
+        self.length = 0
+        for row in rows:
+            self._add(*row)
+        self.vocabulary = sorted(self.postings)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def _add(self, id, question, answer, category, difficulty):
+        # the words seen for the first time
+        weights = _weights(question, answer)
+        length = sum(weights.values())
+        self.questions[id] = (weights, length, str(category), difficulty)
+        self.length += length
+        new = list()
+        for word, weight in weights.items():
+            posting = self.postings.get(word)
+            if posting is None:
+                posting = self.postings[word] = dict()
+                new.append(word)
+            posting[id] = weight
+        return new
+
+    def put(self, id, question, answer, category, difficulty):
+        self.discard(id)
+        for word in self._add(id, question, answer, category, difficulty):
+            insort(self.vocabulary, word)
+
+    def discard(self, id):
+        found = self.questions.pop(id, None)
+        if found is None:
+            return
+        weights, length = found[0], found[1]
+        self.length -= length
+        for word in weights:
+            posting = self.postings[word]
+            del posting[id]
+            if not posting:
+                del self.postings[word]
+                del self.vocabulary[bisect_left(self.vocabulary, word)]
+
+    def _starting(self, prefix):
+        position = bisect_left(self.vocabulary, prefix)
+        while (position < len(self.vocabulary) and
+               self.vocabulary[position].startswith(prefix)):
+            yield self.vocabulary[position]
+            position += 1
+
+    def search(self, terms, category=None, difficulty=None,
+               offset=0, limit=10):
+        '''
+        (number of matches, ids of the matches ranked from offset
+        to offset + limit) for the words `terms`
+        '''
+        if not terms or not self.questions:
+            return 0, []
+        average = self.length / len(self.questions)
+        # {term: {id: weighted count of the words it starts}}
+        counts = dict()
+        for term in set(terms):
+            matched = dict()
+            for word in self._starting(term):
+                for id, weight in self.postings[word].items():
+                    matched[id] = matched.get(id, 0) + weight
+            counts[term] = matched
+        scores = None
+        for term, matched in sorted(counts.items(), key=lambda c: len(c[1])):
+            found = len(matched)
+            idf = math.log(1 + (len(self.questions) - found + 0.5) /
+                           (found + 0.5))
+            ids = matched if scores is None else [
+                id for id in scores if id in matched]
+            ranked = dict()
+            for id in ids:
+                weight = matched[id]
+                length = self.questions[id][1]
+                ranked[id] = (0 if scores is None else scores[id]) + (
+                    idf * weight * (K1 + 1) /
+                    (weight + K1 * (1 - B + B * length / average)))
+            scores = ranked
+            if not scores:
+                break
+        if category is not None or difficulty is not None:
+            scores = {id: score for id, score in scores.items()
+                      if (category is None or
+                          self.questions[id][2] == str(category)) and
+                      (difficulty is None or
+                          self.questions[id][3] == difficulty)}
+        page = heapq.nsmallest(offset + limit, scores.items(),
+                               key=lambda item: (-item[1], item[0]))
+        return len(scores), [id for id, score in page[offset:]]
+
+
+class QuestionSearch(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+
+    def _postgres(self):
+        return db.engine.dialect.name == 'postgresql'
+
+    def setup(self):
+        # create the GIN index of the Postgres search if it is missing
+        if self._postgres():
+            db.session.execute(text(
+                'CREATE INDEX IF NOT EXISTS ix_questions_search '
+                'ON questions USING gin (' + VECTOR.format('') + ')'))
+            db.session.commit()
+
+    def search(self, search_term, category=None, difficulty=None,
+               offset=0, limit=10):
+        '''
+        (number of matches, matching questions ranked from offset
+        to offset + limit)
+        '''
+        terms = words(search_term)
+        if not terms:
+            return 0, []
+        if self._postgres():
+            return self._search_postgres(terms, category, difficulty,
+                                         offset, limit)
+        with self._lock:
+            if self._index is None:
+                self._index = SearchIndex(db.session.query(
+                    Question.id, Question.question, Question.answer,
+                    Question.category, Question.difficulty))
+            total, ids = self._index.search(terms, category, difficulty,
+                                            offset, limit)
+        questions = {question.id: question for question in
+                     Question.query.filter(Question.id.in_(ids))} if ids else {}
+        return total, [questions[id] for id in ids if id in questions]
+
+    def _search_postgres(self, terms, category, difficulty, offset, limit):
+        vector = literal_column(VECTOR.format('questions.'))
+        query = func.to_tsquery('english', ' & '.join(
+            term + ':*' for term in terms))
+        criteria = [vector.op('@@')(query)]
+        if category is not None:
+            criteria.append(Question.category == str(category))
+        if difficulty is not None:
+            criteria.append(Question.difficulty == difficulty)
+        total = question_counts.matching(
+            ('search', tuple(terms), category, difficulty), and_(*criteria))
+        questions = Question.query.filter(*criteria).order_by(
+            func.ts_rank(vector, query).desc(), Question.id).offset(
+            offset).limit(limit).all()
+        return total, questions
+
+    def put(self, question):
+        with self._lock:
+            if self._index is not None:
+                self._index.put(question.id, question.question,
+                                question.answer, question.category,
+                                question.difficulty)
+
+    def discard(self, id):
+        with self._lock:
+            if self._index is not None:
+                self._index.discard(id)
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+
+
+question_search = QuestionSearch()
+
+
+@on_change
+def index_question(row, change):
+    if isinstance(row, Question):
+        if change == 'delete':
+            question_search.discard(row.id)
+        else:
+            question_search.put(row)
@@ -40,6 +40,28 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(len(data['categories']))
 
+    def test_304_sent_for_unchanged_categories(self):
+        res = self.client().get('/categories')
+        etag = res.headers['ETag']
+        res = self.client().get('/categories',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+
+    def test_reload_categories(self):
+        category = Category(type='test')
+        category.insert()
+        res = self.client().get('/categories')
+        data = json.loads(res.data)
+        category.delete()
+        self.assertEqual(data['categories'][str(category.id)], 'test')
+        res = self.client().post('/categories/reload')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        res = self.client().get('/categories')
+        self.assertEqual(res.headers['ETag'], '"{}"'.format(data['version']))
+        self.assertNotIn(str(category.id), json.loads(res.data)['categories'])
+
     def test_404_sent_requesting_categpries_beyond_valid_page(self):
         res = self.client().get('/categories/1000')
         data = json.loads(res.data)
@@ -63,6 +85,24 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertEqual(data['message'], 'resource not found')
 
+    def test_get_questions_after_id(self):
+        res = self.client().get('/questions?after_id=0')
+        first_page = json.loads(res.data)['questions']
+        last_id = first_page[-1]['id']
+        res = self.client().get(f'/questions?after_id={last_id}')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(all(question['id'] > last_id
+                            for question in data['questions']))
+
+    def test_400_sent_requesting_questions_page_zero(self):
+        res = self.client().get('/questions?page=0')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'bad request')
+
     def test_delete_question(self):
         question = Question(question="test", answer="test",category= 1,difficulty= 1)
         question.insert()
@@ -111,6 +151,47 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['totalQuestions'])
         self.assertTrue(len(data['questions']))
 
+    def test_search_question_counts_matches_only(self):
+        question = Question(question="xyzzy plugh", answer="test",
+                            category=1, difficulty=1)
+        question.insert()
+        res = self.client().post('/questions/search',
+                                 json={'searchTerm': 'xyzzy plugh'})
+        data = json.loads(res.data)
+        question.delete()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['totalQuestions'], 1)
+        res = self.client().post('/questions/search',
+                                 json={'searchTerm': 'xyzzy plugh'})
+        data = json.loads(res.data)
+        self.assertEqual(data['totalQuestions'], 0)
+
+    def test_search_question_ranked_and_filtered(self):
+        questions = [
+            Question(question="quuxly quuxly frobnicate", answer="test",
+                     category=1, difficulty=1),
+            Question(question="quuxly frobnicate", answer="test",
+                     category=2, difficulty=2),
+            Question(question="frobnicate", answer="quuxly",
+                     category=1, difficulty=3),
+        ]
+        for question in questions:
+            question.insert()
+        res = self.client().post('/questions/search',
+                                 json={'searchTerm': 'quux frob'})
+        ranked = json.loads(res.data)
+        res = self.client().post('/questions/search', json={
+            'searchTerm': 'quux frob', 'category': 1, 'difficulty': 3})
+        filtered = json.loads(res.data)
+        ids = [question.id for question in questions]
+        for question in questions:
+            question.delete()
+        self.assertEqual(ranked['totalQuestions'], 3)
+        self.assertEqual([question['id'] for question in ranked['questions']],
+                         ids)
+        self.assertEqual(filtered['totalQuestions'], 1)
+        self.assertEqual(filtered['questions'][0]['id'], ids[2])
+
     def test_404_search_question(self):
         res = self.client().post('/questions/search', json={'searchTerm': ''})
         data = json.loads(res.data)
@@ -118,6 +199,13 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertEqual(data['message'], 'resource not found')
 
+    def test_400_search_question_after_id(self):
+        res = self.client().post('/questions/search?after_id=1',
+                                 json={'searchTerm': 'title'})
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+
     def test_get_questions_by_category(self):
         res = self.client().get('/categories/1/questions')
         data = json.loads(res.data)
@@ -143,6 +231,33 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(len(data['question']))
 
+    def test_play_quiz_session_does_not_repeat_questions(self):
+        quiz_round = {'previous_questions': [],
+                      'quiz_category': {'type': 'Science', 'id': 1}}
+        asked = []
+        while True:
+            res = self.client().post('/quizzes', json=quiz_round)
+            data = json.loads(res.data)
+            self.assertEqual(res.status_code, 200)
+            if data['question'] is None:
+                break
+            asked.append(data['question']['id'])
+            quiz_round['quiz_session'] = data['quiz_session']
+            quiz_round.pop('previous_questions', None)
+        self.assertTrue(len(asked))
+        self.assertEqual(len(asked), len(set(asked)))
+
+    def test_410_play_quiz_expired_session(self):
+        quiz_round = {'quiz_session': 'expired',
+                      'quiz_category': {'type': 'Science', 'id': 1}}
+        res = self.client().post('/quizzes', json=quiz_round)
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 410)
+        self.assertEqual(data['success'], False)
+        quiz_round['previous_questions'] = []
+        res = self.client().post('/quizzes', json=quiz_round)
+        self.assertEqual(res.status_code, 200)
+
     def test_422_play_quiz(self):
         new_quiz_round = {'quiz_category': {'type': 'Science', 'id': 1}}
         res = self.client().post('/quizzes', json=new_quiz_round)
@@ -10,6 +10,7 @@ class QuizView extends Component {
     super();
     this.state = {
         quizCategory: null,
+        quizSession: null,
         previousQuestions: [], 
         showAnswer: false,
         categories: {},
@@ -47,15 +48,20 @@ class QuizView extends Component {
     const previousQuestions = [...this.state.previousQuestions]
     if(this.state.currentQuestion.id) { previousQuestions.push(this.state.currentQuestion.id) }
 
+    // the server remembers the questions of a session; they are only sent to start one
+    const quizRound = {quiz_category: this.state.quizCategory}
+    if(this.state.quizSession) {
+      quizRound.quiz_session = this.state.quizSession
+    } else {
+      quizRound.previous_questions = previousQuestions
+    }
+
     $.ajax({
       url: '/quizzes', //TODO: update request URL
       type: "POST",
       dataType: 'json',
       contentType: 'application/json',
-      data: JSON.stringify({
-        previous_questions: previousQuestions,
-        quiz_category: this.state.quizCategory
-      }),
+      data: JSON.stringify(quizRound),
       xhrFields: {
         withCredentials: true
       },
@@ -63,6 +69,7 @@ class QuizView extends Component {
       success: (result) => {
         this.setState({
           showAnswer: false,
+          quizSession: result.quiz_session,
           previousQuestions: previousQuestions,
           currentQuestion: result.question,
           guess: '',
@@ -71,6 +78,11 @@ class QuizView extends Component {
         return;
       },
       error: (error) => {
+        if(error.status === 410 && this.state.quizSession) {
+          // the session expired: start a new one from the questions asked so far
+          this.setState({quizSession: null}, this.getNextQuestion)
+          return;
+        }
         alert('Unable to load question. Please try your request again')
         return;
       }
@@ -90,6 +102,7 @@ class QuizView extends Component {
   restartGame = () => {
     this.setState({
       quizCategory: null,
+      quizSession: null,
       previousQuestions: [], 
       showAnswer: false,
       numCorrect: 0,